@@ -62,25 +62,70 @@ CREATE INDEX idx_messages_conversation ON core.messages(conversation_type);
 -- ============================================================================
 
 -- Message-level predictions from ML models
+-- Range-partitioned by month: 7/30-day window queries prune to the newest
+-- partitions, and old months are removed with DETACH/DROP PARTITION
 CREATE TABLE social.message_predictions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     message_id INTEGER REFERENCES core.messages(message_id) ON DELETE CASCADE,
     user_id VARCHAR(255) REFERENCES core.users(user_id) ON DELETE CASCADE,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
-    -- Risk model outputs
-    p_craving REAL,
-    p_relapse REAL,
-    p_negative_mood REAL,
-    p_neutral REAL,
-    p_toxic REAL,
-    p_isolation REAL,
-    risk_score REAL,
+    -- Risk model outputs, fixed point: probability * 10000 (0..10000)
+    -- p_neutral is not stored: 1 - (craving + relapse + negative_mood + toxic)
+    p_craving SMALLINT,
+    p_relapse SMALLINT,
+    p_negative_mood SMALLINT,
+    p_toxic SMALLINT,
+    p_isolation SMALLINT,
+    risk_score SMALLINT,
     
     -- Metadata
     conversation_type VARCHAR(50),
-    model_version VARCHAR(50)
-);
+    model_version VARCHAR(50),
+    
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Create the monthly partition containing `month` (no-op if it exists).
+-- The social service calls this at startup and then daily for the coming
+-- months; it can also be run from a scheduler. Rows that already landed in
+-- the default partition for that month are moved into the new partition
+-- (PostgreSQL refuses to create it while the default holds matching rows).
+CREATE OR REPLACE FUNCTION social.create_prediction_partition(month DATE)
+RETURNS VOID AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    end_date DATE := (date_trunc('month', month) + INTERVAL '1 month')::date;
+    partition_name TEXT := 'message_predictions_' || to_char(start_date, 'YYYY_MM');
+BEGIN
+    IF to_regclass(format('social.%I', partition_name)) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    
+    CREATE TEMP TABLE moved_predictions AS
+        SELECT * FROM social.message_predictions_default
+        WHERE timestamp >= start_date AND timestamp < end_date;
+    DELETE FROM social.message_predictions_default
+        WHERE timestamp >= start_date AND timestamp < end_date;
+    
+    EXECUTE format(
+        'CREATE TABLE social.%I PARTITION OF social.message_predictions
+         FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_date, end_date
+    );
+    
+    INSERT INTO social.message_predictions SELECT * FROM moved_predictions;
+    DROP TABLE moved_predictions;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Catch-all so inserts never fail when a month was not created in time
+CREATE TABLE social.message_predictions_default
+    PARTITION OF social.message_predictions DEFAULT;
+
+-- Previous, current and next two months
+SELECT social.create_prediction_partition((CURRENT_DATE + make_interval(months => m))::date)
+FROM generate_series(-1, 2) AS m;
 
 -- User-level risk profiles (aggregated over time)
 CREATE TABLE social.user_risk_profiles (
@@ -214,10 +259,16 @@ CREATE TABLE social.meetings (
 );
 
 -- Indexes for social schema
-CREATE INDEX idx_predictions_user_time ON social.message_predictions(user_id, timestamp DESC);
+-- Covering index: the profile window aggregates are served index-only
+CREATE INDEX idx_predictions_user_time ON social.message_predictions(user_id, timestamp DESC)
+    INCLUDE (risk_score, p_isolation, p_relapse, p_craving, p_toxic, conversation_type);
 CREATE INDEX idx_predictions_message ON social.message_predictions(message_id);
 CREATE INDEX idx_risk_profiles_label ON social.user_risk_profiles(current_risk_label);
 CREATE INDEX idx_risk_profiles_updated ON social.user_risk_profiles(last_updated DESC);
+-- Partial index matching get_users_needing_check_in's predicate and ordering
+CREATE INDEX idx_risk_profiles_needs_checkin ON social.user_risk_profiles(days_since_last_buddy_msg DESC)
+    INCLUDE (user_id)
+    WHERE current_risk_label <> 'HIGH_RISK';
 CREATE INDEX idx_actions_user_time ON social.actions(user_id, timestamp DESC);
 CREATE INDEX idx_actions_type ON social.actions(action_type);
 CREATE INDEX idx_actions_status ON social.actions(status);
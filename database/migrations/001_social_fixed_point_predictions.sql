@@ -0,0 +1,38 @@
+-- ============================================================================
+-- Migration 001: social.message_predictions probabilities as fixed point
+-- ============================================================================
+-- Databases created from an older init.sql store the probability columns as
+-- REAL (0..1) and keep p_neutral. The social service now stores
+-- probability * 10000 in SMALLINT columns and derives p_neutral, and refuses
+-- to start until this migration has run.
+--
+-- Run once per existing database:
+--   psql -U postgres -d recoverly_platform -f database/migrations/001_social_fixed_point_predictions.sql
+--
+-- Safe to re-run: columns that are already SMALLINT are left untouched.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF (
+        SELECT data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'social'
+          AND table_name = 'message_predictions'
+          AND column_name = 'p_craving'
+    ) = 'real' THEN
+        ALTER TABLE social.message_predictions
+            ALTER COLUMN p_craving       TYPE SMALLINT USING round(p_craving * 10000)::smallint,
+            ALTER COLUMN p_relapse       TYPE SMALLINT USING round(p_relapse * 10000)::smallint,
+            ALTER COLUMN p_negative_mood TYPE SMALLINT USING round(p_negative_mood * 10000)::smallint,
+            ALTER COLUMN p_toxic         TYPE SMALLINT USING round(p_toxic * 10000)::smallint,
+            ALTER COLUMN p_isolation     TYPE SMALLINT USING round(p_isolation * 10000)::smallint,
+            ALTER COLUMN risk_score      TYPE SMALLINT USING round(risk_score * 10000)::smallint;
+    END IF;
+END
+$$;
+
+ALTER TABLE social.message_predictions DROP COLUMN IF EXISTS p_neutral;
+
+COMMIT;
@@ -0,0 +1,38 @@
+-- ============================================================================
+-- Migration 002: social.create_prediction_partition moves default-partition rows
+-- ============================================================================
+-- Earlier versions of this function failed with "updated partition constraint
+-- for default partition would be violated" once rows for a month had landed in
+-- message_predictions_default, which stopped the social service from booting.
+-- This version moves those rows into the new partition.
+--
+-- Run once per database created from an older init.sql:
+--   psql -U postgres -d recoverly_platform -f database/migrations/002_social_prediction_partition_function.sql
+
+CREATE OR REPLACE FUNCTION social.create_prediction_partition(month DATE)
+RETURNS VOID AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    end_date DATE := (date_trunc('month', month) + INTERVAL '1 month')::date;
+    partition_name TEXT := 'message_predictions_' || to_char(start_date, 'YYYY_MM');
+BEGIN
+    IF to_regclass(format('social.%I', partition_name)) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    
+    CREATE TEMP TABLE moved_predictions AS
+        SELECT * FROM social.message_predictions_default
+        WHERE timestamp >= start_date AND timestamp < end_date;
+    DELETE FROM social.message_predictions_default
+        WHERE timestamp >= start_date AND timestamp < end_date;
+    
+    EXECUTE format(
+        'CREATE TABLE social.%I PARTITION OF social.message_predictions
+         FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_date, end_date
+    );
+    
+    INSERT INTO social.message_predictions SELECT * FROM moved_predictions;
+    DROP TABLE moved_predictions;
+END;
+$$ LANGUAGE plpgsql;
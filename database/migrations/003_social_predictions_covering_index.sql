@@ -0,0 +1,20 @@
+-- ============================================================================
+-- Migration 003: covering index for the profile window aggregates
+-- ============================================================================
+-- Databases created from an older init.sql have a plain
+-- idx_predictions_user_time(user_id, timestamp DESC). The profile aggregates
+-- only read the INCLUDEd columns, so with the covering version they are
+-- served by index-only scans. Builds CONCURRENTLY: writes keep flowing.
+--
+-- Run on a non-partitioned social.message_predictions (before migration 005,
+-- which rebuilds this index on the partitioned table itself). Must run
+-- outside a transaction block, so use plain psql (no -1 / --single-transaction):
+--   psql -U postgres -d recoverly_platform -f database/migrations/003_social_predictions_covering_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_predictions_user_time_covering
+    ON social.message_predictions(user_id, timestamp DESC)
+    INCLUDE (risk_score, p_isolation, p_relapse, p_craving, p_toxic, conversation_type);
+
+DROP INDEX CONCURRENTLY IF EXISTS social.idx_predictions_user_time;
+
+ALTER INDEX social.idx_predictions_user_time_covering RENAME TO idx_predictions_user_time;
@@ -0,0 +1,13 @@
+-- ============================================================================
+-- Migration 004: partial index for check-in candidates
+-- ============================================================================
+-- Matches get_users_needing_check_in's predicate and ordering, so the lookup
+-- reads only non-HIGH_RISK profiles in days_since_last_buddy_msg order.
+-- Builds CONCURRENTLY and is safe to re-run. Must run outside a transaction
+-- block, so use plain psql (no -1 / --single-transaction):
+--   psql -U postgres -d recoverly_platform -f database/migrations/004_social_risk_profiles_checkin_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_risk_profiles_needs_checkin
+    ON social.user_risk_profiles(days_since_last_buddy_msg DESC)
+    INCLUDE (user_id)
+    WHERE current_risk_label <> 'HIGH_RISK';
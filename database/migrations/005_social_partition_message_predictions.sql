@@ -0,0 +1,98 @@
+-- ============================================================================
+-- Migration 005: range-partition social.message_predictions by month
+-- ============================================================================
+-- Converts a plain message_predictions table (databases created from an older
+-- init.sql) to the monthly-partitioned layout: the table is renamed, the
+-- partitioned table and its DEFAULT partition are created, one partition is
+-- created per month from the oldest row to two months ahead, rows are copied
+-- over (ids and the id sequence are kept), and the old table is dropped.
+--
+-- Requires migrations 001 (SMALLINT columns) and 002
+-- (social.create_prediction_partition). Runs in one transaction and holds an
+-- exclusive lock on message_predictions while copying - schedule it in a
+-- maintenance window. Safe to re-run: an already partitioned table is left
+-- untouched.
+--   psql -U postgres -d recoverly_platform -f database/migrations/005_social_partition_message_predictions.sql
+
+BEGIN;
+
+DO $$
+DECLARE
+    id_seq TEXT;
+    first_month DATE;
+    month DATE;
+BEGIN
+    IF (
+        SELECT relkind FROM pg_class WHERE oid = 'social.message_predictions'::regclass
+    ) = 'p' THEN
+        RAISE NOTICE 'social.message_predictions is already partitioned - nothing to do';
+        RETURN;
+    END IF;
+
+    LOCK TABLE social.message_predictions IN ACCESS EXCLUSIVE MODE;
+    id_seq := pg_get_serial_sequence('social.message_predictions', 'id');
+
+    -- Move the old table (and its schema-wide index names) out of the way
+    ALTER TABLE social.message_predictions RENAME TO message_predictions_unpartitioned;
+    ALTER TABLE social.message_predictions_unpartitioned
+        RENAME CONSTRAINT message_predictions_pkey TO message_predictions_unpartitioned_pkey;
+    DROP INDEX IF EXISTS social.idx_predictions_user_time;
+    DROP INDEX IF EXISTS social.idx_predictions_message;
+
+    -- Same layout as init.sql; ids keep coming from the existing sequence
+    EXECUTE format($sql$
+        CREATE TABLE social.message_predictions (
+            id INTEGER NOT NULL DEFAULT nextval(%L::regclass),
+            message_id INTEGER REFERENCES core.messages(message_id) ON DELETE CASCADE,
+            user_id VARCHAR(255) REFERENCES core.users(user_id) ON DELETE CASCADE,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            p_craving SMALLINT,
+            p_relapse SMALLINT,
+            p_negative_mood SMALLINT,
+            p_toxic SMALLINT,
+            p_isolation SMALLINT,
+            risk_score SMALLINT,
+            conversation_type VARCHAR(50),
+            model_version VARCHAR(50),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    $sql$, id_seq);
+
+    CREATE TABLE social.message_predictions_default
+        PARTITION OF social.message_predictions DEFAULT;
+
+    SELECT date_trunc('month', COALESCE(min(timestamp), CURRENT_TIMESTAMP))::date
+    INTO first_month
+    FROM social.message_predictions_unpartitioned;
+
+    FOR month IN
+        SELECT generate_series(
+            first_month,
+            (date_trunc('month', CURRENT_DATE) + INTERVAL '2 months')::date,
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        PERFORM social.create_prediction_partition(month);
+    END LOOP;
+
+    INSERT INTO social.message_predictions (
+        id, message_id, user_id, timestamp,
+        p_craving, p_relapse, p_negative_mood, p_toxic, p_isolation, risk_score,
+        conversation_type, model_version
+    )
+    SELECT
+        id, message_id, user_id, COALESCE(timestamp, CURRENT_TIMESTAMP),
+        p_craving, p_relapse, p_negative_mood, p_toxic, p_isolation, risk_score,
+        conversation_type, model_version
+    FROM social.message_predictions_unpartitioned;
+
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY social.message_predictions.id', id_seq);
+    DROP TABLE social.message_predictions_unpartitioned;
+
+    CREATE INDEX idx_predictions_user_time ON social.message_predictions(user_id, timestamp DESC)
+        INCLUDE (risk_score, p_isolation, p_relapse, p_craving, p_toxic, conversation_type);
+    CREATE INDEX idx_predictions_message ON social.message_predictions(message_id);
+END
+$$;
+
+COMMIT;
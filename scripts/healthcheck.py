@@ -13,37 +13,50 @@ SERVICES = [
     {"name": "Causal Service", "url": "http://localhost:8004/api/health"},
 ]
 
+# Upper bound for the whole run, slightly above the per-request timeout
+TOTAL_TIMEOUT = 6.0
 
-async def check_service(service: Dict) -> Dict:
+
+async def check_service(client: httpx.AsyncClient, service: Dict) -> Dict:
     """Check if a service is healthy"""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(service["url"])
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "name": service["name"],
-                    "status": "✓ Healthy",
-                    "details": data
-                }
-            else:
-                return {
-                    "name": service["name"],
-                    "status": f"✗ Unhealthy (HTTP {response.status_code})",
-                    "details": None
-                }
+        response = await client.get(service["url"])
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "name": service["name"],
+                "status": "✓ Healthy",
+                "details": data
+            }
+        else:
+            return {
+                "name": service["name"],
+                "status": f"✗ Unhealthy (HTTP {response.status_code})",
+                "details": None
+            }
     except httpx.ConnectError:
         return {
             "name": service["name"],
             "status": "✗ Not Running",
             "details": None
         }
-    except Exception as e:
+
+
+def collect_result(service: Dict, task: asyncio.Task) -> Dict:
+    """Turn a finished, failed or timed-out check into a result row"""
+    if not task.done() or task.cancelled():
+        return {
+            "name": service["name"],
+            "status": "✗ Timed out",
+            "details": None
+        }
+    if task.exception() is not None:
         return {
             "name": service["name"],
-            "status": f"✗ Error: {str(e)}",
+            "status": f"✗ Error: {task.exception()}",
             "details": None
         }
+    return task.result()
 
 
 async def check_all_services():
@@ -53,8 +66,18 @@ async def check_all_services():
     print("=" * 60)
     print()
     
-    tasks = [check_service(service) for service in SERVICES]
-    results = await asyncio.gather(*tasks)
+    # One pooled client shared by all checks
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=8)
+    async with httpx.AsyncClient(timeout=5.0, limits=limits) as client:
+        tasks = [asyncio.create_task(check_service(client, service)) for service in SERVICES]
+        
+        # Wait at most TOTAL_TIMEOUT; a slow or failing service only affects its own row
+        _, pending = await asyncio.wait(tasks, timeout=TOTAL_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+        results = [collect_result(service, task) for service, task in zip(SERVICES, tasks)]
     
     for result in results:
         print(f"{result['name']:20} {result['status']}")
@@ -1,44 +1,23 @@
 import asyncio
 import logging
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
-from core.config import DATABASE_URL
 from db import Base
 
-logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-
-# -----------------------------------------------------------------------------
-# Engine
-# -----------------------------------------------------------------------------
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,          # set True only if you want SQL logs
-    pool_pre_ping=True,
-)
-
 # -----------------------------------------------------------------------------
-# Session Factory
+# Engine, Session Factory, Dependency (for FastAPI routes)
+# Shared platform-wide: DB_* settings, pool sizing, DB_NULL_POOL
 # -----------------------------------------------------------------------------
-AsyncSessionLocal = async_sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+from shared.db.base import AsyncSessionLocal, get_db, get_engine  # noqa: F401
 
-# -----------------------------------------------------------------------------
-# Dependency (for FastAPI routes)
-# -----------------------------------------------------------------------------
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
 
 # -----------------------------------------------------------------------------
 # Create Schema + Tables
 # -----------------------------------------------------------------------------
 async def init_db():
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         # Ensure schemas exist (risk + core because auth tables are in core)
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS risk"))
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS core"))
@@ -49,7 +28,7 @@ async def init_db():
         logger.info("✓ All tables created")
 
 async def close_db():
-    await engine.dispose()
+    await get_engine().dispose()
     logger.info("✓ Database engine closed")
 
 # -----------------------------------------------------------------------------
@@ -224,7 +224,7 @@ class InterventionTools:
                 SELECT action_type, timestamp
                 FROM social.actions
                 WHERE user_id = %s
-                  AND timestamp >= (CURRENT_TIMESTAMP - INTERVAL '%s hours')
+                  AND timestamp >= (CURRENT_TIMESTAMP - make_interval(hours => %s))
                 ORDER BY timestamp DESC
                 """,
                 (user_id, hours_back),
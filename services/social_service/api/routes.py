@@ -9,15 +9,22 @@ from pydantic import BaseModel, Field, constr
 from typing import Optional, List
 from datetime import datetime
 from services.social_service.agent.intervention_agent import get_agent
+import asyncio
 import logging
+import logging.handlers
+import queue
 import sys
+import time
 import uuid
+from collections import Counter
 from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr, Field
+from psycopg2.extras import Json
 
 BACKEND_ROOT = Path(__file__).resolve().parents[3]
 if str(BACKEND_ROOT) not in sys.path:
@@ -34,22 +41,32 @@ from shared.auth.user_repo import (
 from core.config import SERVICE_NAME
 
 from core.config import API_CONFIG, MOBILE_APP_CONFIG, LOGGING_CONFIG, SERVICE_NAME
-from db.temporal_engine import TemporalRiskEngine, get_engine
+from db.temporal_engine import TemporalRiskEngine, get_engine, close_engine
 from ml.risk_analyzer import get_analyzer
+from ml.batcher import get_batcher
 from typing import Optional
 
 
 # LOGGING SETUP
+# Request handlers only enqueue records; a background listener thread does
+# the blocking file/console writes
+_log_formatter = logging.Formatter(LOGGING_CONFIG['format'])
+_file_handler = logging.FileHandler(LOGGING_CONFIG['log_file'])
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+
+_log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(
+    _log_queue, _file_handler, _stream_handler, respect_handler_level=True
+)
+log_listener.start()
+
 logging.basicConfig(
     level=LOGGING_CONFIG['level'],
-    format=LOGGING_CONFIG['format'],
-    handlers=[
-        logging.FileHandler(LOGGING_CONFIG['log_file']),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 
 app = FastAPI(
@@ -181,7 +198,7 @@ async def root():
 
 
 @app.post("/auth/register", response_model=AuthResponse)
-async def register(req: RegisterRequest):
+def register(req: RegisterRequest):
     existing = get_user_by_email(req.email)
     if existing:
         raise HTTPException(status_code=409, detail="Email already registered")
@@ -209,7 +226,7 @@ async def register(req: RegisterRequest):
 
 
 @app.post("/auth/login", response_model=AuthResponse)
-async def login(req: LoginRequest):
+def login(req: LoginRequest):
     user = get_user_by_email(req.email)
     if not user or user.get("status") != "active":
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -233,39 +250,25 @@ async def login(req: LoginRequest):
 
 
 @app.get("/auth/me")
-async def me(user_id: str = Depends(get_current_user_id)):
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-    from shared.core.settings import settings
-
-    conn = psycopg2.connect(
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        options="-c search_path=core",
-    )
+def me(user_id: str = Depends(get_current_user_id)):
+    engine = get_engine()
 
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT user_id, email, full_name, status
-                FROM core.users
-                WHERE user_id = %s
-                """,
-                (user_id,),
-            )
-            row = cur.fetchone()
-            if not row:
-                raise HTTPException(status_code=404, detail="User not found")
-            return row
-    finally:
-        conn.close()
+    with engine.get_cursor() as cur:
+        cur.execute(
+            """
+            SELECT user_id, email, full_name, status
+            FROM core.users
+            WHERE user_id = %s
+            """,
+            (user_id,),
+        )
+        row = cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    return row
 
 @app.post("/api/v1/support/setup")
-async def save_support_setup(
+def save_support_setup(
     body: SupportSetupIn,
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
@@ -366,7 +369,7 @@ async def save_support_setup(
     }
 
 @app.get("/api/v1/support/setup")
-async def get_support_setup(
+def get_support_setup(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -423,7 +426,7 @@ async def get_support_setup(
     }
 
 @app.get("/api/v1/trusted-contact/primary")
-async def get_primary_trusted_contact(
+def get_primary_trusted_contact(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -457,7 +460,7 @@ async def get_primary_trusted_contact(
     return row
 
 @app.get("/api/v1/counselor-contact/primary")
-async def get_primary_counselor_contact(
+def get_primary_counselor_contact(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -490,7 +493,7 @@ async def get_primary_counselor_contact(
     return row
 
 @app.post("/api/v1/trusted-contact/notify")
-async def notify_trusted_contact(
+def notify_trusted_contact(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -561,7 +564,7 @@ async def notify_trusted_contact(
                 CURRENT_TIMESTAMP,
                 %s,
                 %s,
-                %s::jsonb,
+                %s,
                 %s,
                 %s,
                 %s
@@ -571,14 +574,14 @@ async def notify_trusted_contact(
             user_id,
             "trusted_contact_notification",
             "HIGH_RISK",
-            f"""{{
-                "contact_id": {contact["contact_id"]},
-                "contact_name": "{contact["contact_name"]}",
-                "relationship": "{contact.get("relationship") or ""}",
-                "phone": "{contact.get("phone") or ""}",
-                "email": "{contact.get("email") or ""}",
+            Json({
+                "contact_id": contact["contact_id"],
+                "contact_name": contact["contact_name"],
+                "relationship": contact.get("relationship") or "",
+                "phone": contact.get("phone") or "",
+                "email": contact.get("email") or "",
                 "mode": "demo_simulation"
-            }}""",
+            }),
             "completed",
             "Trusted contact escalation prepared for high-risk support flow",
             0.95,
@@ -595,7 +598,7 @@ async def notify_trusted_contact(
     }
 
 @app.get("/api/v1/trusted-contact/support/current")
-async def get_current_trusted_contact_support(
+def get_current_trusted_contact_support(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -649,32 +652,19 @@ async def get_current_trusted_contact_support(
     }
 
 @app.get("/auth/users")
-async def get_all_users(user_id: str = Depends(get_current_user_id)):
+def get_all_users(user_id: str = Depends(get_current_user_id)):
     """
     Get list of all registered users
     Requires authentication
     """
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-    from shared.core.settings import settings
-
-    conn = psycopg2.connect(
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-        dbname=settings.DB_NAME,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        options="-c search_path=core",
-    )
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT user_id, email, full_name FROM core.users WHERE status = 'active' ORDER BY email"
-            )
-            rows = cur.fetchall()
-            return {"users": rows}
-    finally:
-        conn.close()
+    engine = get_engine()
+
+    with engine.get_cursor() as cur:
+        cur.execute(
+            "SELECT user_id, email, full_name FROM core.users WHERE status = 'active' ORDER BY email"
+        )
+        rows = cur.fetchall()
+    return {"users": rows}
 
 
 @app.post("/api/v1/analyze-message", response_model=MessageResponse)
@@ -693,23 +683,26 @@ async def analyze_message(
     4. Store predictions in social.message_predictions
     5. Return predictions to app    
 
+    Blocking psycopg2 calls run in the threadpool so a slow query does not
+    stall the event loop (and the inference batcher) for other requests
     """
     try:
         logger.info(f"Analyzing message from user: {request.user_id}")
         
-        # Get analyzer and engine
-        analyzer = get_analyzer()
+        # Get analyzer and engine (first get_analyzer() call loads the models)
+        analyzer = await run_in_threadpool(get_analyzer)
         engine = get_engine()
 
         # Ensure user exists in core.users (important for FK constraint)
-        engine.ensure_user_exists(request.user_id)
+        await run_in_threadpool(engine.ensure_user_exists, request.user_id)
         
-        # Run ML models
-        predictions = analyzer.analyze_message(request.message_text)
+        # Run ML models (coalesced with concurrent requests into one batch)
+        predictions = await get_batcher().analyze(request.message_text)
         logger.debug(f"Predictions: {predictions}")
         
         # Store in database
-        message_id, prediction_id = engine.store_message_with_prediction(
+        message_id, prediction_id = await run_in_threadpool(
+            engine.store_message_with_prediction,
             user_id=request.user_id,
             message_text=request.message_text,
             predictions=predictions,
@@ -723,12 +716,12 @@ async def analyze_message(
         # AUTO-UPDATE USER RISK PROFILE
 
         thresholds = analyzer.get_thresholds()
-        profile = engine.update_user_risk_profile(request.user_id,thresholds)
+        profile = await run_in_threadpool(engine.update_user_risk_profile, request.user_id, thresholds)
         logger.info(f"Updated risk profile: {profile['current_risk_label']}")
 
         # Trigger agent
         agent = get_agent(engine)
-        actions = agent.process_user(profile)
+        actions = await run_in_threadpool(agent.process_user, profile)
         logger.info(f"Auto-triggered {len(actions)} interventions for {request.user_id}")
 
         # # AUTO-TRIGGER RISK CHECK (if message has high risk)
@@ -755,7 +748,7 @@ async def analyze_message(
 
 
 @app.get("/api/v1/user-risk/{user_id}", response_model=UserRiskProfile)
-async def get_user_risk(
+def get_user_risk(
     user_id: str,
     api_key: str = Depends(verify_api_key)
 ):
@@ -789,7 +782,7 @@ async def get_user_risk(
 
 
 @app.post("/api/v1/trigger-risk-check/{user_id}")
-async def trigger_risk_check(
+def trigger_risk_check(
     user_id: str,
     api_key: str = Depends(verify_api_key)
 ):
@@ -830,7 +823,7 @@ async def trigger_risk_check(
 
 
 @app.get("/api/v1/users-needing-checkin")
-async def get_users_needing_checkin(
+def get_users_needing_checkin(
     days_silent: int = 3,
     api_key: str = Depends(verify_api_key)
 ):
@@ -861,7 +854,7 @@ async def get_users_needing_checkin(
 
 
 @app.get("/api/v1/admin/all-users")
-async def get_all_users(
+def get_all_users(
     api_key: str = Depends(verify_api_key)
 ):
     """
@@ -887,24 +880,33 @@ async def get_all_users(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Dashboard stats change slowly; serve them from memory for a short TTL
+STATS_CACHE_TTL_SECONDS = 10.0
+_stats_cache = {'expires_at': 0.0, 'value': None}
+
+
 @app.get("/api/v1/admin/stats")
-async def get_system_stats(
+def get_system_stats(
     api_key: str = Depends(verify_api_key)
 ):
     """
     Get overall system statistics
+    Cached for STATS_CACHE_TTL_SECONDS
     """
+    now = time.monotonic()
+    if _stats_cache['value'] is not None and now < _stats_cache['expires_at']:
+        return _stats_cache['value']
+
     try:
         engine = get_engine()
         profiles = engine.get_all_user_profiles()
         
         # Count by risk label
-        risk_distribution = {}
-        for profile in profiles:
-            label = profile.get('risk_label', 'UNKNOWN')
-            risk_distribution[label] = risk_distribution.get(label, 0) + 1
+        risk_distribution = dict(Counter(
+            profile.get('current_risk_label') or 'UNKNOWN' for profile in profiles
+        ))
         
-        return {
+        stats = {
             "total_users": len(profiles),
             "risk_distribution": risk_distribution,
             "high_risk_count": risk_distribution.get('HIGH_RISK', 0),
@@ -913,13 +915,16 @@ async def get_system_stats(
             "low_risk_count": risk_distribution.get('LOW_RISK', 0),
             "timestamp": datetime.now().isoformat()
         }
+        _stats_cache['value'] = stats
+        _stats_cache['expires_at'] = now + STATS_CACHE_TTL_SECONDS
+        return stats
         
     except Exception as e:
         logger.error(f"Error getting stats: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat/conversations/one-to-one")
-async def create_or_get_one_to_one(
+def create_or_get_one_to_one(
     body: OneToOneConversationRequest,
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key)
@@ -933,7 +938,7 @@ async def create_or_get_one_to_one(
 
 
 @app.get("/chat/conversations")
-async def list_my_conversations(
+def list_my_conversations(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key)
 ):
@@ -942,7 +947,7 @@ async def list_my_conversations(
 
 
 @app.get("/chat/conversations/{conversation_id}/messages")
-async def get_conversation_messages(
+def get_conversation_messages(
     conversation_id: int,
     limit: int = 50,
     user_id: str = Depends(get_user_id_from_token),
@@ -961,18 +966,20 @@ async def send_message_rest(
     api_key: str = Depends(verify_api_key)
 ):
     engine = get_engine()
-    engine.assert_user_in_conversation(conversation_id, user_id)
+    await run_in_threadpool(engine.assert_user_in_conversation, conversation_id, user_id)
 
-    recipient_id = engine.get_other_participant(conversation_id, user_id)
+    recipient_id = await run_in_threadpool(engine.get_other_participant, conversation_id, user_id)
 
-    analyzer = get_analyzer()
-    predictions = analyzer.analyze_message(body.text)
+    analyzer = await run_in_threadpool(get_analyzer)
+    # Coalesced with concurrent chat/analyze requests into one model batch
+    predictions = await get_batcher().analyze(body.text)
 
     # IMPORTANT: set conversation_type from DB (recommended)
     # For MVP, you can pass "buddy" and later fix.
     conversation_type = "buddy"
 
-    message_id, prediction_id = engine.store_message_with_prediction(
+    message_id, prediction_id = await run_in_threadpool(
+        engine.store_message_with_prediction,
         user_id=user_id,
         message_text=body.text,
         predictions=predictions,
@@ -983,16 +990,16 @@ async def send_message_rest(
 
     # profile + intervention logic (your existing)
     thresholds = analyzer.get_thresholds()
-    profile = engine.update_user_risk_profile(user_id, thresholds)
+    profile = await run_in_threadpool(engine.update_user_risk_profile, user_id, thresholds)
     
     agent = get_agent(engine)
-    actions = agent.process_user(profile)
+    actions = await run_in_threadpool(agent.process_user, profile)
     logger.info(f"Auto-triggered {len(actions)} interventions for {user_id}")
 
     return {"message_id": message_id, "prediction_id": prediction_id}
 
 @app.get("/api/v1/interventions/next")
-async def get_next_intervention(
+def get_next_intervention(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -1052,7 +1059,7 @@ async def get_next_intervention(
     return {"type": "NONE", "source": None, "payload": None}
 
 @app.post("/api/v1/interventions/nudges/{nudge_id}/viewed")
-async def mark_nudge_viewed(
+def mark_nudge_viewed(
     nudge_id: int,
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
@@ -1067,7 +1074,7 @@ async def mark_nudge_viewed(
     return {"ok": True}
 
 @app.post("/api/v1/interventions/nudges/{nudge_id}/respond")
-async def respond_to_nudge(
+def respond_to_nudge(
     nudge_id: int,
     response: str,  # "positive" | "negative" | "ignored"
     user_id: str = Depends(get_user_id_from_token),
@@ -1090,7 +1097,7 @@ async def respond_to_nudge(
     return {"ok": True}
 
 @app.post("/api/v1/interventions/escalations/{escalation_id}/acknowledge")
-async def acknowledge_escalation(
+def acknowledge_escalation(
     escalation_id: int,
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
@@ -1106,7 +1113,7 @@ async def acknowledge_escalation(
     return {"ok": True}
 
 @app.get("/api/v1/interventions/counselor-support/current")
-async def get_current_counselor_support(
+def get_current_counselor_support(
     user_id: str = Depends(get_user_id_from_token),
     api_key: str = Depends(verify_api_key),
 ):
@@ -1188,15 +1195,42 @@ async def get_current_counselor_support(
 # STARTUP/SHUTDOWN
 
 
+# How often upcoming message_predictions partitions are (re)checked
+PARTITION_CHECK_INTERVAL_S = 24 * 60 * 60
+_partition_task: Optional[asyncio.Task] = None
+
+
+async def _maintain_prediction_partitions():
+    """Keep the coming months' partitions in place while the service runs"""
+    engine = get_engine()
+    while True:
+        try:
+            await run_in_threadpool(engine.ensure_prediction_partitions)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL_S)
+
+
 @app.on_event("startup")
 async def startup_event():
+    global _partition_task
     logger.info(f"Starting {SERVICE_NAME}")
+    # Open the connection pool up front instead of on the first request
+    get_engine()
+    _partition_task = asyncio.create_task(_maintain_prediction_partitions())
+    await get_batcher().start()
     logger.info("Auth-only API is ready")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"Shutting down {SERVICE_NAME}")
+    if _partition_task is not None:
+        _partition_task.cancel()
+    await get_batcher().stop()
+    close_engine()
+    # Flush queued log records before the process exits
+    log_listener.stop()
 
 
 if __name__ == "__main__":
@@ -40,7 +40,8 @@ DB_CONFIG = {
     'user': os.getenv('DB_USER', 'postgres'),
     'password': os.getenv('DB_PASSWORD', 'postgres'),  # CHANGE IN .ENV!
     'min_conn': int(os.getenv('DB_MIN_CONN', 2)),
-    'max_conn': int(os.getenv('DB_MAX_CONN', 10)),
+    # Pool size; unset = TemporalRiskEngine default (scaled to CPU count)
+    'max_conn': int(os.environ['DB_MAX_CONN']) if os.getenv('DB_MAX_CONN') else None,
     'options': '-c search_path=social,core'  # Access ONLY social schema + shared core schema
 }
 
@@ -66,6 +67,52 @@ if not ISOLATION_MODEL_PATH.exists():
 
 
 
+# MODEL INFERENCE SETTINGS
+
+INFERENCE_CONFIG = {
+    # Per-message prediction cache (0 disables caching)
+    'prediction_cache_size': int(os.getenv('PREDICTION_CACHE_SIZE', 50000)),
+    
+    # Dynamic INT8 quantization of Linear layers on CPU-only hosts:
+    # 'auto' only on CPUs with int8 dot-product instructions (VNNI/AMX,
+    # Arm dotprod), 'true' always, 'false' keeps FP32 weights
+    'quantize_cpu': os.getenv('QUANTIZE_INT8', 'auto').lower(),
+    
+    # Weight/activation dtype on GPU: 'float16', 'bfloat16', 'float32', or
+    # 'auto' (bfloat16 where supported - Ampere+ - else float16)
+    'gpu_dtype': os.getenv('INFERENCE_GPU_DTYPE', 'float16').lower(),
+    
+    # Intra-op threads for CPU inference (0 = one per core); inter-op
+    # parallelism is pinned to 1 thread since requests are batched instead
+    'torch_num_threads': int(os.getenv('TORCH_NUM_THREADS', 0)),
+    
+    # Run both classifiers with ONNX Runtime (fused attention/LayerNorm/GELU
+    # graphs); needs optimum[onnxruntime], falls back to PyTorch otherwise
+    'onnx_runtime': os.getenv('ONNX_RUNTIME', 'false').lower() == 'true',
+    
+    # On CUDA, run the ONNX graph through ONNX Runtime's TensorRT provider
+    # (FP16); engines are cached per GPU arch/TensorRT version. Needs
+    # ONNX_RUNTIME=true and onnxruntime-gpu built with TensorRT
+    'tensorrt': os.getenv('TENSORRT', 'false').lower() == 'true',
+    
+    # Compile both classifiers with torch.compile at load time
+    'compile_models': os.getenv('TORCH_COMPILE', 'false').lower() == 'true',
+    
+    # Sequence lengths batches are padded up to when models are compiled,
+    # so each compiled graph is reused instead of recompiled per length
+    'length_buckets': [32, 64, 128, 256],
+    
+    # Micro-batching of concurrent /analyze-message requests
+    'max_batch_size': int(os.getenv('INFERENCE_MAX_BATCH', 32)),
+    'max_batch_wait_ms': float(os.getenv('INFERENCE_MAX_WAIT_MS', 5)),
+    'queue_maxsize': int(os.getenv('INFERENCE_QUEUE_SIZE', 1024)),
+    
+    # Approximate token-length groups; each batch is drawn from one group
+    # so short messages are not padded to the length of long ones
+    'batch_length_buckets': [32, 96, 256]
+}
+
+
 # FUSION CONFIGURATION
 
 FUSION_CONFIG_PATH = PROJECT_ROOT / "ml" / "fusion_v2.json"
@@ -4,14 +4,148 @@ Uses existing tables in 'social' schema of 'recoverly_platform' database
 Aligned with actual database initialization script
 """
 
+import csv
+import io
+import os
 import psycopg2
+import psycopg2.extensions
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
-import numpy as np
+from typing import Dict, Iterable, List, Tuple, Optional
 import json
 from contextlib import contextmanager
+from dataclasses import dataclass
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Probabilities are stored as SMALLINT fixed point (probability * PROB_SCALE)
+PROB_SCALE = 10000
+
+# Stored prediction columns, in insert order (p_neutral is derived on read)
+PREDICTION_COLUMNS = (
+    'p_craving', 'p_relapse', 'p_negative_mood', 'p_toxic', 'p_isolation', 'risk_score'
+)
+
+
+def to_fixed_point(predictions: Dict[str, float]) -> Tuple[int, ...]:
+    """Scale a prediction dict to the stored SMALLINT values (PREDICTION_COLUMNS order)"""
+    return tuple(
+        int(round(predictions.get(col, 0.0) * PROB_SCALE)) for col in PREDICTION_COLUMNS
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Thresholds:
+    """fusion_v2 thresholds, resolved once instead of dict.get per check"""
+    high: float = 0.7
+    mid: float = 0.3
+    relapse: float = 0.5
+    craving: float = 0.5
+    toxic: float = 0.7
+    iso: float = 0.9
+    iso_escalate: float = 0.7
+    
+    @classmethod
+    def from_config(cls, thresholds) -> "Thresholds":
+        """Build from the fusion config dict (missing keys keep the defaults)"""
+        if isinstance(thresholds, cls):
+            return thresholds
+        
+        defaults = cls()
+        return cls(
+            high=thresholds.get('T_high', defaults.high),
+            mid=thresholds.get('T_mid', defaults.mid),
+            relapse=thresholds.get('T_relapse', defaults.relapse),
+            craving=thresholds.get('T_craving', defaults.craving),
+            toxic=thresholds.get('T_toxic', defaults.toxic),
+            iso=thresholds.get('T_iso', defaults.iso),
+            iso_escalate=thresholds.get('T_iso_escalate', defaults.iso_escalate)
+        )
+
+
+def window_cutoffs(now: datetime) -> Dict[str, datetime]:
+    """
+    Timestamp cutoffs for the profile windows, computed once per update
+    
+    "(now - ts).days <= N" is the same test as "ts > now - (N + 1) days",
+    so the aggregate query compares plain timestamps.
+    """
+    return {
+        'c2': now - timedelta(days=3),    # (now - ts).days <= 2
+        'c7': now - timedelta(days=7),    # short window (ts >= c7)
+        'c7d': now - timedelta(days=8),   # (now - ts).days <= 7
+        'c14d': now - timedelta(days=15), # (now - ts).days <= 14
+        'c30': now - timedelta(days=30)   # medium window (ts >= c30)
+    }
+
+
+# Message-level "high risk" test shared by the aggregate queries
+HIGH_RISK_MESSAGE_SQL = (
+    "risk_score >= %(t_high)s OR p_relapse >= %(t_relapse)s OR p_craving >= %(t_craving)s"
+)
+
+
+# Risk profile upsert; {values} is a VALUES row list. risk_label_since only
+# moves when the label changes, so the previous row never has to be read first
+PROFILE_UPSERT_SQL = """
+    INSERT INTO {schema}.user_risk_profiles (
+        user_id, last_updated,
+        short_avg_risk_score, short_max_risk_score, short_avg_isolation,
+        short_high_risk_count, short_toxic_incidents,
+        medium_avg_risk_score, medium_max_risk_score, medium_avg_isolation,
+        risk_trend, isolation_trend,
+        current_risk_label, risk_label_since,
+        total_messages_7d, buddy_messages_7d, counselor_messages_7d,
+        last_message_time, days_since_last_buddy_msg,
+        reasons
+    ) VALUES {values}
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_updated = EXCLUDED.last_updated,
+        short_avg_risk_score = EXCLUDED.short_avg_risk_score,
+        short_max_risk_score = EXCLUDED.short_max_risk_score,
+        short_avg_isolation = EXCLUDED.short_avg_isolation,
+        short_high_risk_count = EXCLUDED.short_high_risk_count,
+        short_toxic_incidents = EXCLUDED.short_toxic_incidents,
+        medium_avg_risk_score = EXCLUDED.medium_avg_risk_score,
+        medium_max_risk_score = EXCLUDED.medium_max_risk_score,
+        medium_avg_isolation = EXCLUDED.medium_avg_isolation,
+        risk_trend = EXCLUDED.risk_trend,
+        isolation_trend = EXCLUDED.isolation_trend,
+        current_risk_label = EXCLUDED.current_risk_label,
+        risk_label_since = CASE
+            WHEN user_risk_profiles.current_risk_label = EXCLUDED.current_risk_label
+            THEN user_risk_profiles.risk_label_since
+            ELSE EXCLUDED.risk_label_since
+        END,
+        total_messages_7d = EXCLUDED.total_messages_7d,
+        buddy_messages_7d = EXCLUDED.buddy_messages_7d,
+        counselor_messages_7d = EXCLUDED.counselor_messages_7d,
+        last_message_time = EXCLUDED.last_message_time,
+        days_since_last_buddy_msg = EXCLUDED.days_since_last_buddy_msg,
+        reasons = EXCLUDED.reasons
+    RETURNING user_id, risk_label_since
+"""
+
+
+def default_pool_size() -> int:
+    """
+    Pool size default: a small multiple of the CPU count, capped at 32
+    
+    PostgreSQL throughput peaks well below one connection per request
+    thread; extra connections only add contention.
+    """
+    return min(32, 2 * (os.cpu_count() or 1))
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Pooled connection that remembers which statements it has PREPAREd"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
 
 
 class TemporalRiskEngine:
@@ -33,8 +167,9 @@ class TemporalRiskEngine:
         user: str = "postgres",
         password: str = "1234",
         min_conn: int = 1,
-        max_conn: int = 10,
-        schema: str = "social"
+        max_conn: Optional[int] = None,
+        schema: str = "social",
+        application_name: str = "temporal_risk_engine"
     ):
         """
         Initialize with PostgreSQL connection parameters
@@ -46,11 +181,15 @@ class TemporalRiskEngine:
             user: Database user
             password: Database password
             min_conn: Minimum connections in pool
-            max_conn: Maximum connections in pool
+            max_conn: Maximum connections in pool (default: min(32, 2 * CPUs))
             schema: Schema to use (default: social)
+            application_name: Name shown in pg_stat_activity
         """
         self.schema = schema
         
+        if max_conn is None:
+            max_conn = default_pool_size()
+        
         try:
             # Create connection pool for concurrent access
             self.connection_pool = psycopg2.pool.ThreadedConnectionPool(
@@ -61,7 +200,12 @@ class TemporalRiskEngine:
                 database=database,
                 user=user,
                 password=password,
-                options=f'-c search_path={schema},core'  # Access social + core schemas
+                options=f'-c search_path={schema},core',  # Access social + core schemas
+                application_name=application_name,
+                keepalives=1,            # Detect dead peers behind NAT / LB
+                keepalives_idle=30,
+                keepalives_interval=10,
+                connection_factory=PreparingConnection
             )
             
             # Verify tables exist (don't create them - they should already exist)
@@ -71,23 +215,56 @@ class TemporalRiskEngine:
             raise Exception(f"Failed to connect to PostgreSQL: {e}")
     
     @contextmanager
-    def get_cursor(self, cursor_factory=RealDictCursor):
+    def transaction(self):
         """
-        Context manager for database connections from pool
-        Ensures connections are properly returned to pool
+        Context manager for one transaction on a pooled connection
+        
+        Yields the connection so several cursors/statements share a single
+        commit (or rollback on error). Returns the connection to the pool.
         """
         conn = self.connection_pool.getconn()
+        
+        # Discard connections the server closed while they sat in the pool
+        while conn.closed:
+            self.connection_pool.putconn(conn, close=True)
+            conn = self.connection_pool.getconn()
+        
         try:
-            cursor = conn.cursor(cursor_factory=cursor_factory)
-            yield cursor
+            yield conn
             conn.commit()
         except Exception as e:
             conn.rollback()
             raise e
         finally:
-            cursor.close()
             self.connection_pool.putconn(conn)
     
+    @contextmanager
+    def get_cursor(self, cursor_factory=RealDictCursor):
+        """
+        Context manager for database connections from pool
+        Ensures connections are properly returned to pool
+        """
+        with self.transaction() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+    
+    @staticmethod
+    def _execute_prepared(cursor, name: str, sql: str, params: Tuple):
+        """
+        Execute a hot statement through a server-side prepared statement
+        
+        The statement ($1..$n placeholders) is PREPAREd the first time a
+        pooled connection runs it; later calls only EXECUTE, skipping the
+        parse and plan steps.
+        """
+        conn = cursor.connection
+        if name not in conn.prepared:
+            cursor.execute(f"PREPARE {name} AS {sql}")
+            conn.prepared.add(name)
+        
+        placeholders = ', '.join(['%s'] * len(params))
+        cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+    
     def _verify_tables(self):
         """
         Verify that required tables exist in social schema
@@ -117,6 +294,67 @@ class TemporalRiskEngine:
                     f"Missing tables in {self.schema} schema: {missing}. "
                     "Please run the database initialization script first."
                 )
+            
+            # Probabilities are stored as SMALLINT fixed point (PROB_SCALE);
+            # reading REAL columns with this code would misscale every score
+            cursor.execute("""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_schema = %s AND table_name = 'message_predictions'
+            """, (self.schema,))
+            column_types = {row['column_name']: row['data_type'] for row in cursor.fetchall()}
+            
+            outdated = [col for col in PREDICTION_COLUMNS if column_types.get(col) != 'smallint']
+            if outdated or 'p_neutral' in column_types:
+                raise Exception(
+                    f"{self.schema}.message_predictions uses the old REAL probability schema "
+                    f"(columns: {outdated or ['p_neutral']}). "
+                    "Run database/migrations/001_social_fixed_point_predictions.sql first."
+                )
+    
+    def ensure_prediction_partitions(self, months_ahead: int = 2) -> int:
+        """
+        Create message_predictions partitions for this month and the next ones
+        
+        Each month is created in its own transaction; a failure is logged and
+        does not stop the remaining months (or service startup). Databases
+        created before partitioning must first run
+        database/migrations/005_social_partition_message_predictions.sql;
+        until then this logs a warning and creates nothing.
+        
+        Returns:
+            Number of months that failed
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT c.relkind = 'p' AND to_regproc(%s) IS NOT NULL AS partitioned
+                FROM pg_class c
+                WHERE c.oid = to_regclass(%s)
+            """, (
+                f"{self.schema}.create_prediction_partition",
+                f"{self.schema}.message_predictions"
+            ))
+            row = cursor.fetchone()
+            if not row or not row['partitioned']:
+                logger.warning(
+                    f"{self.schema}.message_predictions is not partitioned - run "
+                    "database/migrations/005_social_partition_message_predictions.sql"
+                )
+                return 0
+        
+        failed = 0
+        for months in range(months_ahead + 1):
+            try:
+                with self.get_cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT {self.schema}.create_prediction_partition(
+                            (CURRENT_DATE + make_interval(months => %s))::date
+                        )
+                    """, (months,))
+            except psycopg2.Error as e:
+                failed += 1
+                logger.error(f"Could not create message_predictions partition (+{months} months): {e}")
+        return failed
     
     def ensure_user_exists(
         self, 
@@ -177,22 +415,16 @@ class TemporalRiskEngine:
         with self.get_cursor() as cursor:
             ts = timestamp or datetime.now()
             
-            cursor.execute(f"""
+            self._execute_prepared(cursor, 'store_prediction', f"""
                 INSERT INTO {self.schema}.message_predictions (
                     message_id, user_id, timestamp,
-                    p_craving, p_relapse, p_negative_mood, p_neutral, p_toxic,
+                    p_craving, p_relapse, p_negative_mood, p_toxic,
                     p_isolation, risk_score, conversation_type
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
                 RETURNING id
             """, (
                 message_id, user_id, ts,
-                predictions.get('p_craving', 0.0),
-                predictions.get('p_relapse', 0.0),
-                predictions.get('p_negative_mood', 0.0),
-                predictions.get('p_neutral', 0.0),
-                predictions.get('p_toxic', 0.0),
-                predictions.get('p_isolation', 0.0),
-                predictions.get('risk_score', 0.0),
+                *to_fixed_point(predictions),
                 conversation_type
             ))
             
@@ -221,32 +453,26 @@ class TemporalRiskEngine:
             ts = timestamp or datetime.now()
             
             # 1. Store message in core.messages
-            cursor.execute("""
+            self._execute_prepared(cursor, 'store_message', """
                 INSERT INTO core.messages (
                     user_id, message_text, timestamp, conversation_type, recipient_id, conversation_id
-                ) VALUES (%s, %s, %s, %s, %s, %s)
+                ) VALUES ($1, $2, $3, $4, $5, $6)
                 RETURNING message_id
             """, (user_id, message_text, ts, conversation_type, recipient_id, conversation_id))
             
             message_id = cursor.fetchone()['message_id']
             
             # 2. Store predictions in social.message_predictions
-            cursor.execute(f"""
+            self._execute_prepared(cursor, 'store_prediction', f"""
                 INSERT INTO {self.schema}.message_predictions (
                     message_id, user_id, timestamp,
-                    p_craving, p_relapse, p_negative_mood, p_neutral, p_toxic,
+                    p_craving, p_relapse, p_negative_mood, p_toxic,
                     p_isolation, risk_score, conversation_type
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
                 RETURNING id
             """, (
                 message_id, user_id, ts,
-                predictions.get('p_craving', 0.0),
-                predictions.get('p_relapse', 0.0),
-                predictions.get('p_negative_mood', 0.0),
-                predictions.get('p_neutral', 0.0),
-                predictions.get('p_toxic', 0.0),
-                predictions.get('p_isolation', 0.0),
-                predictions.get('risk_score', 0.0),
+                *to_fixed_point(predictions),
                 conversation_type
             ))
             
@@ -254,128 +480,266 @@ class TemporalRiskEngine:
             
             return message_id, prediction_id
     
-    def get_user_messages(
-        self, 
-        user_id: str, 
-        days_back: int = 30
-    ) -> List[Dict]:
+    def store_messages_with_predictions_batch(
+        self,
+        rows: List[Tuple],
+        page_size: int = 500
+    ) -> List[Tuple[int, int]]:
         """
-        Get user's messages with predictions by joining core.messages and social.message_predictions
+        Store many messages and their predictions in one transaction
+        
+        Batched counterpart of store_message_with_prediction: two multi-row
+        INSERTs per page instead of two round-trips per message.
+        
+        Args:
+            rows: (user_id, message_text, predictions, conversation_type, timestamp)
+                  tuples; timestamp may be None for "now"
+            page_size: Rows per INSERT statement
+        
+        Returns:
+            List of (message_id, prediction_id) in input order
         """
+        if not rows:
+            return []
+        
+        now = datetime.now()
+        rows = [(u, text, p, ctype, ts or now) for u, text, p, ctype, ts in rows]
+        
         with self.get_cursor() as cursor:
-            cursor.execute(f"""
-                SELECT 
-                    m.message_id,
-                    m.message_text,
-                    m.timestamp,
-                    p.p_craving,
-                    p.p_relapse,
-                    p.p_negative_mood,
-                    p.p_neutral,
-                    p.p_toxic,
-                    p.p_isolation,
-                    p.risk_score,
-                    p.conversation_type
-                FROM core.messages m
-                JOIN {self.schema}.message_predictions p ON m.message_id = p.message_id
-                WHERE m.user_id = %s
-                  AND m.timestamp >= (CURRENT_TIMESTAMP - INTERVAL '%s days')
-                ORDER BY m.timestamp ASC
-            """, (user_id, days_back))
+            # 1. Store messages in core.messages
+            message_ids = [r['message_id'] for r in execute_values(
+                cursor,
+                """
+                INSERT INTO core.messages (
+                    user_id, message_text, timestamp, conversation_type
+                ) VALUES %s
+                RETURNING message_id
+                """,
+                [(u, text, ts, ctype) for u, text, _, ctype, ts in rows],
+                page_size=page_size,
+                fetch=True
+            )]
             
-            return cursor.fetchall()
+            # 2. Store predictions in social.message_predictions
+            prediction_ids = [r['id'] for r in execute_values(
+                cursor,
+                f"""
+                INSERT INTO {self.schema}.message_predictions (
+                    message_id, user_id, timestamp,
+                    p_craving, p_relapse, p_negative_mood, p_toxic,
+                    p_isolation, risk_score, conversation_type
+                ) VALUES %s
+                RETURNING id
+                """,
+                [
+                    (message_id, u, ts, *to_fixed_point(p), ctype)
+                    for message_id, (u, _, p, ctype, ts) in zip(message_ids, rows)
+                ],
+                page_size=page_size,
+                fetch=True
+            )]
+            
+            return list(zip(message_ids, prediction_ids))
     
-    def compute_window_metrics(
-        self, 
-        messages: List[Dict],
-        window_days: int,
-        thresholds: Dict
-    ) -> Dict:
+    def bulk_load_messages(self, rows: Iterable[Tuple]) -> int:
         """
-        Compute aggregated metrics over a time window
+        Bulk-load historical messages with predictions using COPY
+        
+        For backfills and replays: rows are streamed into a temporary
+        staging table with COPY, then moved into core.messages and
+        social.message_predictions with two set-based INSERT ... SELECTs.
+        
+        Args:
+            rows: (user_id, message_text, predictions, conversation_type, timestamp)
+                  tuples, as for store_messages_with_predictions_batch
+        
+        Returns:
+            Number of messages loaded
         """
-        if not messages:
-            return {
-                'avg_risk_score': 0.0,
-                'max_risk_score': 0.0,
-                'avg_isolation': 0.0,
-                'high_risk_count': 0,
-                'toxic_incidents': 0,
-                'message_count': 0
-            }
+        now = datetime.now()
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        count = 0
         
-        # Filter to window
-        cutoff = datetime.now() - timedelta(days=window_days)
-        windowed = [m for m in messages if m['timestamp'] >= cutoff]
+        for user_id, text, predictions, ctype, ts in rows:
+            writer.writerow((user_id, text, ts or now, ctype, *to_fixed_point(predictions)))
+            count += 1
         
-        if not windowed:
-            return {
-                'avg_risk_score': 0.0,
-                'max_risk_score': 0.0,
-                'avg_isolation': 0.0,
-                'high_risk_count': 0,
-                'toxic_incidents': 0,
-                'message_count': 0
-            }
+        if not count:
+            return 0
         
-        risk_scores = [m['risk_score'] for m in windowed]
-        isolation_probs = [m['p_isolation'] for m in windowed]
+        buf.seek(0)
+        columns = "user_id, message_text, timestamp, conversation_type, " + ", ".join(PREDICTION_COLUMNS)
         
-        # Count high-risk messages using thresholds
-        high_risk_count = sum(
-            1 for m in windowed 
-            if m['risk_score'] >= thresholds.get('T_high', 0.7) or 
-               m['p_relapse'] >= thresholds.get('T_relapse', 0.5) or 
-               m['p_craving'] >= thresholds.get('T_craving', 0.5)
-        )
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE message_staging (
+                    user_id VARCHAR(255),
+                    message_text TEXT,
+                    timestamp TIMESTAMP,
+                    conversation_type VARCHAR(50),
+                    p_craving SMALLINT,
+                    p_relapse SMALLINT,
+                    p_negative_mood SMALLINT,
+                    p_toxic SMALLINT,
+                    p_isolation SMALLINT,
+                    risk_score SMALLINT,
+                    message_id INTEGER
+                ) ON COMMIT DROP
+            """)
+            
+            cursor.copy_expert(
+                f"COPY message_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buf
+            )
+            
+            # Reserve message ids up front so predictions can reference them
+            cursor.execute("""
+                UPDATE message_staging
+                SET message_id = nextval(pg_get_serial_sequence('core.messages', 'message_id'))
+            """)
+            
+            cursor.execute("""
+                INSERT INTO core.messages (
+                    message_id, user_id, message_text, timestamp, conversation_type
+                )
+                SELECT message_id, user_id, message_text, timestamp, conversation_type
+                FROM message_staging
+            """)
+            
+            cursor.execute(f"""
+                INSERT INTO {self.schema}.message_predictions (
+                    message_id, user_id, timestamp,
+                    p_craving, p_relapse, p_negative_mood, p_toxic,
+                    p_isolation, risk_score, conversation_type
+                )
+                SELECT
+                    message_id, user_id, timestamp,
+                    p_craving, p_relapse, p_negative_mood, p_toxic,
+                    p_isolation, risk_score, conversation_type
+                FROM message_staging
+            """)
         
-        toxic_incidents = sum(
-            1 for m in windowed 
-            if m['p_toxic'] >= thresholds.get('T_toxic', 0.7)
-        )
+        return count
+    
+    def get_profile_aggregates(
+        self,
+        user_ids: List[str],
+        thresholds: Dict,
+        now: datetime,
+        cursor=None
+    ) -> Dict[str, Dict]:
+        """
+        Compute every window, trend and engagement statistic in one query
         
-        return {
-            'avg_risk_score': float(np.mean(risk_scores)),
-            'max_risk_score': float(np.max(risk_scores)),
-            'avg_isolation': float(np.mean(isolation_probs)),
-            'high_risk_count': high_risk_count,
-            'toxic_incidents': toxic_incidents,
-            'message_count': len(windowed)
+        Conditional aggregates (FILTER) over the last 30 days of predictions
+        replace fetching the rows and filtering them in Python. Cutoffs are
+        computed from `now` so window edges match the Python helpers:
+        - short window: timestamp >= now - 7 days
+        - "(now - ts).days <= N": timestamp > now - (N + 1) days
+        
+        Pass `cursor` to run inside a caller's transaction.
+        
+        Returns:
+            {user_id: aggregates row} (AVG/MAX are None for empty windows,
+            and in the stored PROB_SCALE fixed point); users without
+            messages in the last 30 days are absent
+        """
+        if cursor is None:
+            with self.get_cursor() as cursor:
+                return self.get_profile_aggregates(user_ids, thresholds, now, cursor)
+        
+        t = Thresholds.from_config(thresholds)
+        params = {
+            'user_ids': list(user_ids),
+            **window_cutoffs(now),
+            # Thresholds in the stored fixed-point scale
+            't_high': t.high * PROB_SCALE,
+            't_relapse': t.relapse * PROB_SCALE,
+            't_craving': t.craving * PROB_SCALE,
+            't_toxic': t.toxic * PROB_SCALE
         }
+        
+        cursor.execute(f"""
+            SELECT
+                user_id,
+                COUNT(*) AS message_count,
+                MAX(timestamp) AS last_message_time,
+                
+                -- Medium window (30 days)
+                AVG(risk_score) AS medium_avg_risk_score,
+                MAX(risk_score) AS medium_max_risk_score,
+                AVG(p_isolation) AS medium_avg_isolation,
+                COUNT(*) FILTER (WHERE {HIGH_RISK_MESSAGE_SQL}) AS medium_high_risk_count,
+                COUNT(*) FILTER (WHERE p_toxic >= %(t_toxic)s) AS medium_toxic_incidents,
+                
+                -- Short window (7 days)
+                COUNT(*) FILTER (WHERE timestamp >= %(c7)s) AS short_message_count,
+                AVG(risk_score) FILTER (WHERE timestamp >= %(c7)s) AS short_avg_risk_score,
+                MAX(risk_score) FILTER (WHERE timestamp >= %(c7)s) AS short_max_risk_score,
+                AVG(p_isolation) FILTER (WHERE timestamp >= %(c7)s) AS short_avg_isolation,
+                COUNT(*) FILTER (
+                    WHERE timestamp >= %(c7)s AND ({HIGH_RISK_MESSAGE_SQL})
+                ) AS short_high_risk_count,
+                COUNT(*) FILTER (
+                    WHERE timestamp >= %(c7)s AND p_toxic >= %(t_toxic)s
+                ) AS short_toxic_incidents,
+                
+                -- Trend windows: last 7 days vs the 7 days before, last 2 days
+                AVG(risk_score) FILTER (WHERE timestamp > %(c7d)s) AS recent_avg_risk_score,
+                AVG(risk_score) FILTER (
+                    WHERE timestamp <= %(c7d)s AND timestamp > %(c14d)s
+                ) AS previous_avg_risk_score,
+                MAX(risk_score) FILTER (WHERE timestamp > %(c2)s) AS last_2d_max_risk_score,
+                AVG(p_isolation) FILTER (WHERE timestamp > %(c7d)s) AS recent_avg_isolation,
+                AVG(p_isolation) FILTER (
+                    WHERE timestamp <= %(c7d)s AND timestamp > %(c14d)s
+                ) AS previous_avg_isolation,
+                MAX(p_isolation) FILTER (WHERE timestamp > %(c2)s) AS last_2d_max_isolation,
+                
+                -- Engagement (last 7 days)
+                COUNT(*) FILTER (WHERE timestamp > %(c7d)s) AS total_messages_7d,
+                COUNT(*) FILTER (
+                    WHERE timestamp > %(c7d)s AND conversation_type = 'buddy'
+                ) AS buddy_messages_7d,
+                COUNT(*) FILTER (
+                    WHERE timestamp > %(c7d)s AND conversation_type = 'counselor'
+                ) AS counselor_messages_7d,
+                MAX(timestamp) FILTER (
+                    WHERE timestamp > %(c7d)s AND conversation_type = 'buddy'
+                ) AS last_buddy_message_time
+            FROM {self.schema}.message_predictions
+            WHERE user_id = ANY(%(user_ids)s)
+              AND timestamp >= %(c30)s
+            GROUP BY user_id
+        """, params)
+        
+        return {row['user_id']: row for row in cursor.fetchall()}
     
-    def detect_trend(
-        self,
-        messages: List[Dict],
-        metric: str = 'risk_score'
+    @staticmethod
+    def classify_trend(
+        message_count: int,
+        recent_avg: Optional[float],
+        previous_avg: Optional[float],
+        last_2d_max: Optional[float]
     ) -> str:
         """
-        Detect if user's risk is improving, stable, or declining
+        Trend label from window aggregates (same rules as detect_trend)
         
         Returns:
             'improving', 'stable', 'declining', or 'rapid_decline'
         """
-        if len(messages) < 5:
+        if message_count < 5:
             return 'stable'
         
-        now = datetime.now()
-        recent_7d = [m for m in messages if (now - m['timestamp']).days <= 7]
-        previous_7d = [m for m in messages if 7 < (now - m['timestamp']).days <= 14]
-        
-        if not recent_7d or not previous_7d:
+        if recent_avg is None or previous_avg is None:
             return 'stable'
         
-        recent_avg = np.mean([m[metric] for m in recent_7d])
-        previous_avg = np.mean([m[metric] for m in previous_7d])
+        # Check for rapid decline (spike in last 2 days)
+        if last_2d_max is not None and last_2d_max >= 0.8:
+            return 'rapid_decline'
         
         delta = recent_avg - previous_avg
         
-        # Check for rapid decline (spike in last 2 days)
-        last_2d = [m for m in messages if (now - m['timestamp']).days <= 2]
-        if last_2d:
-            last_2d_max = max(m[metric] for m in last_2d)
-            if last_2d_max >= 0.8:
-                return 'rapid_decline'
-        
         if delta < -0.15:
             return 'improving'
         elif delta > 0.15:
@@ -383,40 +747,6 @@ class TemporalRiskEngine:
         else:
             return 'stable'
     
-    def compute_engagement_metrics(
-        self,
-        user_id: str,
-        messages: List[Dict]
-    ) -> Dict:
-        """
-        Compute engagement metrics
-        """
-        now = datetime.now()
-        
-        messages_7d = [m for m in messages if (now - m['timestamp']).days <= 7]
-        
-        buddy_msgs = [m for m in messages_7d if m.get('conversation_type') == 'buddy']
-        counselor_msgs = [m for m in messages_7d if m.get('conversation_type') == 'counselor']
-        
-        if buddy_msgs:
-            last_buddy = max(m['timestamp'] for m in buddy_msgs)
-            days_since_buddy = (now - last_buddy).days
-        else:
-            days_since_buddy = 999
-        
-        if messages:
-            last_msg_time = max(m['timestamp'] for m in messages)
-        else:
-            last_msg_time = None
-        
-        return {
-            'total_messages_7d': len(messages_7d),
-            'buddy_messages_7d': len(buddy_msgs),
-            'counselor_messages_7d': len(counselor_msgs),
-            'last_message_time': last_msg_time,
-            'days_since_last_buddy_msg': days_since_buddy
-        }
-    
     def apply_final_risk_decision(
         self,
         short_metrics: Dict,
@@ -428,7 +758,10 @@ class TemporalRiskEngine:
     ) -> Tuple[str, List[str]]:
         """
         Apply fusion_v2 logic to determine final risk label
+        
+        `thresholds` is the fusion config dict or a prebuilt Thresholds
         """
+        t = Thresholds.from_config(thresholds)
         reasons = []
         
         short_max_risk = short_metrics['max_risk_score']
@@ -437,7 +770,7 @@ class TemporalRiskEngine:
         short_avg_iso = short_metrics['avg_isolation']
         
         # HIGH RISK
-        if short_max_risk >= thresholds.get('T_high', 0.7):
+        if short_max_risk >= t.high:
             reasons.append(f"Max risk score in last 7 days: {short_max_risk:.3f}")
             return 'HIGH_RISK', reasons
         
@@ -449,13 +782,13 @@ class TemporalRiskEngine:
             reasons.append("Rapid decline detected")
             return 'HIGH_RISK', reasons
         
-        if short_avg_risk >= thresholds.get('T_iso_escalate', 0.7) and \
-           short_avg_iso >= thresholds.get('T_iso', 0.9):
+        if short_avg_risk >= t.iso_escalate and \
+           short_avg_iso >= t.iso:
             reasons.append("Isolation escalating moderate risk")
             return 'HIGH_RISK', reasons
         
         # MODERATE RISK
-        if short_avg_risk >= thresholds.get('T_mid', 0.3):
+        if short_avg_risk >= t.mid:
             reasons.append(f"Elevated average risk: {short_avg_risk:.3f}")
             return 'MODERATE_RISK', reasons
         
@@ -468,7 +801,7 @@ class TemporalRiskEngine:
             return 'MODERATE_RISK', reasons
         
         # ISOLATION ONLY
-        if short_avg_iso >= thresholds.get('T_iso', 0.9) and short_avg_risk < 0.3:
+        if short_avg_iso >= t.iso and short_avg_risk < 0.3:
             reasons.append("High isolation without addiction risk")
             return 'ISOLATION_ONLY', reasons
         
@@ -476,20 +809,17 @@ class TemporalRiskEngine:
         reasons.append("No significant risk indicators")
         return 'LOW_RISK', reasons
     
-    def update_user_risk_profile(
-        self, 
+    def _build_risk_profile(
+        self,
         user_id: str,
-        thresholds: Dict
+        agg: Optional[Dict],
+        thresholds: Dict,
+        now: datetime
     ) -> Dict:
         """
-        Compute and store complete risk profile for a user
-        
-        Updates social.user_risk_profiles table
+        Turn one user's aggregates into a risk profile (fusion_v2 decision)
         """
-        # Get messages with predictions
-        messages = self.get_user_messages(user_id, days_back=30)
-        
-        if not messages:
+        if not agg:
             return {
                 'user_id': user_id,
                 'current_risk_label': 'LOW_RISK',
@@ -497,16 +827,47 @@ class TemporalRiskEngine:
                 'reasons': ['No message history']
             }
         
+        def scaled(value):
+            # Fixed-point aggregate back to a [0, 1] float (None stays None)
+            return None if value is None else float(value) / PROB_SCALE
+        
         # Compute metrics
-        short_metrics = self.compute_window_metrics(messages, 7, thresholds)
-        medium_metrics = self.compute_window_metrics(messages, 30, thresholds)
+        short_metrics = {
+            'avg_risk_score': scaled(agg['short_avg_risk_score']) or 0.0,
+            'max_risk_score': scaled(agg['short_max_risk_score']) or 0.0,
+            'avg_isolation': scaled(agg['short_avg_isolation']) or 0.0,
+            'high_risk_count': agg['short_high_risk_count'],
+            'toxic_incidents': agg['short_toxic_incidents'],
+            'message_count': agg['short_message_count']
+        }
+        medium_metrics = {
+            'avg_risk_score': scaled(agg['medium_avg_risk_score']) or 0.0,
+            'max_risk_score': scaled(agg['medium_max_risk_score']) or 0.0,
+            'avg_isolation': scaled(agg['medium_avg_isolation']) or 0.0,
+            'high_risk_count': agg['medium_high_risk_count'],
+            'toxic_incidents': agg['medium_toxic_incidents'],
+            'message_count': agg['message_count']
+        }
         
         # Detect trends
-        risk_trend = self.detect_trend(messages, 'risk_score')
-        isolation_trend = self.detect_trend(messages, 'p_isolation')
+        risk_trend = self.classify_trend(
+            agg['message_count'], scaled(agg['recent_avg_risk_score']),
+            scaled(agg['previous_avg_risk_score']), scaled(agg['last_2d_max_risk_score'])
+        )
+        isolation_trend = self.classify_trend(
+            agg['message_count'], scaled(agg['recent_avg_isolation']),
+            scaled(agg['previous_avg_isolation']), scaled(agg['last_2d_max_isolation'])
+        )
         
         # Engagement
-        engagement = self.compute_engagement_metrics(user_id, messages)
+        last_buddy = agg['last_buddy_message_time']
+        engagement = {
+            'total_messages_7d': agg['total_messages_7d'],
+            'buddy_messages_7d': agg['buddy_messages_7d'],
+            'counselor_messages_7d': agg['counselor_messages_7d'],
+            'last_message_time': agg['last_message_time'],
+            'days_since_last_buddy_msg': (now - last_buddy).days if last_buddy else 999
+        }
         
         # Final decision
         risk_label, reasons = self.apply_final_risk_decision(
@@ -514,79 +875,10 @@ class TemporalRiskEngine:
             risk_trend, isolation_trend, thresholds
         )
         
-        # Store in database
-        with self.get_cursor() as cursor:
-            now = datetime.now()
-            
-            # Check if label changed
-            cursor.execute(f"""
-                SELECT current_risk_label, risk_label_since 
-                FROM {self.schema}.user_risk_profiles 
-                WHERE user_id = %s
-            """, (user_id,))
-            
-            existing = cursor.fetchone()
-            
-            if existing and existing['current_risk_label'] == risk_label:
-                risk_label_since = existing['risk_label_since']
-            else:
-                risk_label_since = now
-            
-            # Update user_risk_profiles
-            cursor.execute(f"""
-                INSERT INTO {self.schema}.user_risk_profiles (
-                    user_id, last_updated,
-                    short_avg_risk_score, short_max_risk_score, short_avg_isolation,
-                    short_high_risk_count, short_toxic_incidents,
-                    medium_avg_risk_score, medium_max_risk_score, medium_avg_isolation,
-                    risk_trend, isolation_trend,
-                    current_risk_label, risk_label_since,
-                    total_messages_7d, buddy_messages_7d, counselor_messages_7d,
-                    last_message_time, days_since_last_buddy_msg,
-                    reasons
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s
-                )
-                ON CONFLICT (user_id) DO UPDATE SET
-                    last_updated = EXCLUDED.last_updated,
-                    short_avg_risk_score = EXCLUDED.short_avg_risk_score,
-                    short_max_risk_score = EXCLUDED.short_max_risk_score,
-                    short_avg_isolation = EXCLUDED.short_avg_isolation,
-                    short_high_risk_count = EXCLUDED.short_high_risk_count,
-                    short_toxic_incidents = EXCLUDED.short_toxic_incidents,
-                    medium_avg_risk_score = EXCLUDED.medium_avg_risk_score,
-                    medium_max_risk_score = EXCLUDED.medium_max_risk_score,
-                    medium_avg_isolation = EXCLUDED.medium_avg_isolation,
-                    risk_trend = EXCLUDED.risk_trend,
-                    isolation_trend = EXCLUDED.isolation_trend,
-                    current_risk_label = EXCLUDED.current_risk_label,
-                    risk_label_since = EXCLUDED.risk_label_since,
-                    total_messages_7d = EXCLUDED.total_messages_7d,
-                    buddy_messages_7d = EXCLUDED.buddy_messages_7d,
-                    counselor_messages_7d = EXCLUDED.counselor_messages_7d,
-                    last_message_time = EXCLUDED.last_message_time,
-                    days_since_last_buddy_msg = EXCLUDED.days_since_last_buddy_msg,
-                    reasons = EXCLUDED.reasons
-            """, (
-                user_id, now,
-                short_metrics['avg_risk_score'], short_metrics['max_risk_score'],
-                short_metrics['avg_isolation'], short_metrics['high_risk_count'],
-                short_metrics['toxic_incidents'],
-                medium_metrics['avg_risk_score'], medium_metrics['max_risk_score'],
-                medium_metrics['avg_isolation'],
-                risk_trend, isolation_trend,
-                risk_label, risk_label_since,
-                engagement['total_messages_7d'], engagement['buddy_messages_7d'],
-                engagement['counselor_messages_7d'], engagement['last_message_time'],
-                engagement['days_since_last_buddy_msg'],
-                Json(reasons)
-            ))
-        
         return {
             'user_id': user_id,
             'current_risk_label': risk_label,
-            'risk_label_since': risk_label_since,
+            'risk_label_since': now,
             'reasons': reasons,
             'short_window': short_metrics,
             'medium_window': medium_metrics,
@@ -598,6 +890,112 @@ class TemporalRiskEngine:
             'last_updated': now
         }
     
+    @staticmethod
+    def _profile_row(profile: Dict) -> Tuple:
+        """Column values for PROFILE_UPSERT_SQL, in insert order"""
+        short_metrics = profile['short_window']
+        medium_metrics = profile['medium_window']
+        engagement = profile['engagement']
+        
+        return (
+            profile['user_id'], profile['last_updated'],
+            short_metrics['avg_risk_score'], short_metrics['max_risk_score'],
+            short_metrics['avg_isolation'], short_metrics['high_risk_count'],
+            short_metrics['toxic_incidents'],
+            medium_metrics['avg_risk_score'], medium_metrics['max_risk_score'],
+            medium_metrics['avg_isolation'],
+            profile['trends']['risk'], profile['trends']['isolation'],
+            profile['current_risk_label'], profile['risk_label_since'],
+            engagement['total_messages_7d'], engagement['buddy_messages_7d'],
+            engagement['counselor_messages_7d'], engagement['last_message_time'],
+            engagement['days_since_last_buddy_msg'],
+            Json(profile['reasons'])
+        )
+    
+    def update_user_risk_profile(
+        self, 
+        user_id: str,
+        thresholds: Dict
+    ) -> Dict:
+        """
+        Compute and store complete risk profile for a user
+        
+        Updates social.user_risk_profiles table
+        """
+        now = datetime.now()
+        thresholds = Thresholds.from_config(thresholds)
+        
+        # Read aggregates and write the profile in one transaction
+        with self.get_cursor() as cursor:
+            # All window metrics, trends and engagement in one round trip
+            agg = self.get_profile_aggregates([user_id], thresholds, now, cursor).get(user_id)
+            profile = self._build_risk_profile(user_id, agg, thresholds, now)
+            
+            if not agg:
+                return profile
+            
+            # Store in database
+            self._execute_prepared(
+                cursor,
+                'upsert_risk_profile',
+                PROFILE_UPSERT_SQL.format(
+                    schema=self.schema,
+                    values="($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, "
+                           "$15, $16, $17, $18, $19, $20)"
+                ),
+                self._profile_row(profile)
+            )
+            
+            profile['risk_label_since'] = cursor.fetchone()['risk_label_since']
+        
+        return profile
+    
+    def update_user_risk_profiles_bulk(
+        self,
+        user_ids: List[str],
+        thresholds: Dict
+    ) -> List[Dict]:
+        """
+        Compute and store risk profiles for many users
+        
+        One aggregate query and one multi-row upsert for the whole batch,
+        instead of a round trip pair per user.
+        
+        Returns:
+            Profiles in the order of user_ids (duplicates dropped)
+        """
+        # A user may appear only once in the multi-row upsert ("ON CONFLICT
+        # DO UPDATE command cannot affect row a second time")
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return []
+        
+        now = datetime.now()
+        thresholds = Thresholds.from_config(thresholds)
+        
+        with self.get_cursor() as cursor:
+            aggregates = self.get_profile_aggregates(user_ids, thresholds, now, cursor)
+            
+            profiles = [
+                self._build_risk_profile(uid, aggregates.get(uid), thresholds, now)
+                for uid in user_ids
+            ]
+            stored = [p for p in profiles if p['user_id'] in aggregates]
+            
+            if stored:
+                returned = execute_values(
+                    cursor,
+                    PROFILE_UPSERT_SQL.format(schema=self.schema, values="%s"),
+                    [self._profile_row(p) for p in stored],
+                    fetch=True
+                )
+                
+                since = {row['user_id']: row['risk_label_since'] for row in returned}
+                for p in stored:
+                    p['risk_label_since'] = since[p['user_id']]
+        
+        return profiles
+    
     def get_users_needing_check_in(self, days_silent: int = 3) -> List[str]:
         """Get users who need check-ins"""
         with self.get_cursor() as cursor:
@@ -780,13 +1178,34 @@ class TemporalRiskEngine:
 _engine_instance = None
 
 def get_engine() -> TemporalRiskEngine:
-    """Get or create engine instance"""
+    """
+    Get or create engine instance
+    The engine owns the process-wide connection pool, sized from DB_CONFIG
+    """
     global _engine_instance
     if _engine_instance is None:
-        _engine_instance = TemporalRiskEngine()
+        from core.config import DB_CONFIG, SOCIAL_SCHEMA
+        _engine_instance = TemporalRiskEngine(
+            host=DB_CONFIG['host'],
+            port=DB_CONFIG['port'],
+            database=DB_CONFIG['database'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            min_conn=DB_CONFIG['min_conn'],
+            max_conn=DB_CONFIG['max_conn'],
+            schema=SOCIAL_SCHEMA
+        )
     return _engine_instance
 
 
+def close_engine():
+    """Close the engine's connection pool (call on service shutdown)"""
+    global _engine_instance
+    if _engine_instance is not None:
+        _engine_instance.close()
+        _engine_instance = None
+
+
 # Test
 if __name__ == "__main__":
     print("=" * 80)
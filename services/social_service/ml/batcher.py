@@ -0,0 +1,204 @@
+"""
+Inference Batcher - Coalesces concurrent analysis requests
+Queues incoming messages and scores them in shared batched forward passes
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .risk_analyzer import get_analyzer
+from core.config import INFERENCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# (text, future, enqueue time)
+PendingRequest = Tuple[str, asyncio.Future, float]
+
+
+class InferenceBatcher:
+    """
+    Micro-batcher in front of RiskAnalyzer.analyze_messages
+    
+    Requests wait at most max_wait_ms (or until max_batch requests are
+    queued), then the whole group runs through the models together and
+    each caller gets its own prediction back through a Future.
+    
+    Waiting requests are grouped by approximate token length, and every
+    batch is drawn from a single group (the one holding the oldest
+    request), so a short "ok" is never padded to a 256-token message.
+    
+    When nothing is queued or running, a request is scored directly
+    without waiting out the batching window; requests arriving while it
+    runs queue up and form the next batch.
+    """
+    
+    def __init__(
+        self,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        queue_maxsize: int = 1024,
+        length_buckets: Optional[List[int]] = None
+    ):
+        """
+        Args:
+            max_batch: Maximum number of messages per forward pass
+            max_wait_ms: How long the first queued message waits for company
+            queue_maxsize: Pending requests before callers are back-pressured
+            length_buckets: Upper token-length bounds of the request groups
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue_maxsize = queue_maxsize
+        self.length_buckets = sorted(length_buckets or [256])
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Held for every forward pass (direct or batched), one at a time
+        self._forward_lock: Optional[asyncio.Lock] = None
+        self._buckets: List[Deque[PendingRequest]] = [deque() for _ in self.length_buckets]
+        # Batch currently being scored (already popped from its bucket)
+        self._in_flight: List[PendingRequest] = []
+    
+    async def start(self):
+        """Start the background batching loop on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_maxsize)
+            self._forward_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Inference batcher started (max_batch={self.max_batch}, "
+                f"max_wait={self.max_wait * 1000:.1f}ms, buckets={self.length_buckets})"
+            )
+    
+    async def stop(self):
+        """Stop the batching loop and fail any requests still queued"""
+        if self._task is None:
+            return
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        
+        while not self._queue.empty():
+            self._bucket_for(self._queue.get_nowait())
+        # Cancelled mid-batch: those requests are in neither queue nor bucket
+        pending = self._in_flight
+        self._in_flight = []
+        for bucket in self._buckets:
+            while bucket:
+                pending.append(bucket.popleft())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference batcher stopped"))
+    
+    async def analyze(self, text: str) -> Dict[str, float]:
+        """
+        Queue a message for analysis and wait for its prediction
+        
+        Args:
+            text: User message
+            
+        Returns:
+            Dict with all predictions ready for database storage
+        """
+        if self._task is None:
+            await self.start()
+        
+        loop = asyncio.get_running_loop()
+        if self._idle():
+            # Fast path: no batch to join, so skip the queue and the window
+            async with self._forward_lock:
+                predictions = await loop.run_in_executor(None, self._analyze_batch, [text])
+            return predictions[0]
+        
+        future = loop.create_future()
+        await self._queue.put((text, future, loop.time()))
+        return await future
+    
+    def _idle(self) -> bool:
+        """No forward pass running and no requests waiting"""
+        return not self._forward_lock.locked() and self._queue.empty() and not any(self._buckets)
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Cheap token-count estimate (~4 characters per WordPiece token + CLS/SEP)"""
+        return len(text) // 4 + 2
+    
+    def _bucket_for(self, request: PendingRequest):
+        """Place a pending request in the group matching its length"""
+        tokens = self._estimate_tokens(request[0])
+        index = next(
+            (i for i, bound in enumerate(self.length_buckets) if tokens <= bound),
+            len(self.length_buckets) - 1
+        )
+        self._buckets[index].append(request)
+    
+    def _drain_queue(self):
+        """Move newly queued requests into the length groups"""
+        held = sum(len(bucket) for bucket in self._buckets)
+        # Stop at queue_maxsize so the bounded queue keeps back-pressuring callers
+        while held < self.queue_maxsize and not self._queue.empty():
+            self._bucket_for(self._queue.get_nowait())
+            held += 1
+    
+    async def _run(self):
+        """Collect queued requests into batches and score them"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            if not any(self._buckets):
+                self._bucket_for(await self._queue.get())
+                # Give concurrent requests a short window to join this batch
+                await asyncio.sleep(self.max_wait)
+            
+            async with self._forward_lock:
+                # Also picks up requests that arrived during a direct call
+                self._drain_queue()
+                
+                # Serve the group holding the oldest waiting request
+                bucket = min((b for b in self._buckets if b), key=lambda b: b[0][2])
+                batch = [bucket.popleft() for _ in range(min(self.max_batch, len(bucket)))]
+                self._in_flight = batch
+                
+                texts = [text for text, _, _ in batch]
+                try:
+                    # Model forward passes are blocking; keep them off the event loop
+                    predictions = await loop.run_in_executor(None, self._analyze_batch, texts)
+                except Exception as e:
+                    logger.error(f"Batched inference failed for {len(texts)} messages: {e}")
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    self._in_flight = []
+                    continue
+            
+            for (_, future, _), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+            self._in_flight = []
+    
+    @staticmethod
+    def _analyze_batch(texts: List[str]) -> List[Dict[str, float]]:
+        """Run one batched analysis (models are loaded on first use)"""
+        return get_analyzer().analyze_messages(texts)
+
+
+# Singleton instance
+_batcher_instance = None
+
+def get_batcher() -> InferenceBatcher:
+    """Get or create the inference batcher instance"""
+    global _batcher_instance
+    if _batcher_instance is None:
+        _batcher_instance = InferenceBatcher(
+            max_batch=INFERENCE_CONFIG['max_batch_size'],
+            max_wait_ms=INFERENCE_CONFIG['max_batch_wait_ms'],
+            queue_maxsize=INFERENCE_CONFIG['queue_maxsize'],
+            length_buckets=INFERENCE_CONFIG['batch_length_buckets']
+        )
+    return _batcher_instance
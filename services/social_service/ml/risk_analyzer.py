@@ -3,16 +3,41 @@ Risk Analyzer - Wraps your trained ML models for inference
 Handles loading models and running predictions
 """
 
+import os
+
+# Let the fast (Rust) tokenizers encode batches on multiple threads.
+# Must be set before transformers/tokenizers are imported; uvicorn starts
+# reload/worker processes with spawn, so no fork-after-use warning.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
 import torch
 import numpy as np
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from typing import Dict
+from typing import Dict, List, Optional
+import hashlib
 import json
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
-import sys
-sys.path.append(str(Path(__file__).parent.parent))
-from core.config import RISK_MODEL_PATH, ISOLATION_MODEL_PATH, FUSION_CONFIG_PATH, RISK_SETTINGS
+from core.config import (
+    RISK_MODEL_PATH, ISOLATION_MODEL_PATH, FUSION_CONFIG_PATH, RISK_SETTINGS, INFERENCE_CONFIG
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Per-message prediction fields, in the column order used by batched scoring
+PREDICTION_FIELDS = (
+    'p_craving',
+    'p_relapse',
+    'p_negative_mood',
+    'p_neutral',
+    'p_toxic',
+    'p_isolation',
+    'risk_score'
+)
 
 
 class RiskAnalyzer:
@@ -24,42 +49,496 @@ class RiskAnalyzer:
     def __init__(self):
         """Load models and configuration"""
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Using device: {self.device}")
+        # Half precision on GPU; classification heads are insensitive to it
+        self.dtype = self._gpu_dtype() if self.device == "cuda" else torch.float32
+        logger.info(f"Using device: {self.device} ({self.dtype})")
+        
+        # Autograd is off per call via @torch.inference_mode() on every
+        # forward path (grad mode is thread-local, so a global switch here
+        # would not reach the executor threads that run inference)
+        if self.device == "cpu":
+            self._configure_cpu_threads()
         
         # Load risk classification model
-        print("Loading risk classification model...")
+        logger.info("Loading risk classification model...")
         self.risk_tokenizer = AutoTokenizer.from_pretrained(str(RISK_MODEL_PATH), use_fast=True)
-        self.risk_model = AutoModelForSequenceClassification.from_pretrained(
-            str(RISK_MODEL_PATH)
-        ).to(self.device)
-        self.risk_model.eval()
+        self.risk_model = self._load_model(RISK_MODEL_PATH)
         
         # Load isolation detection model
-        print("Loading isolation detection model...")
+        logger.info("Loading isolation detection model...")
         self.isolation_tokenizer = AutoTokenizer.from_pretrained(str(ISOLATION_MODEL_PATH), use_fast=True)
-        self.isolation_model = AutoModelForSequenceClassification.from_pretrained(
-            str(ISOLATION_MODEL_PATH)
-        ).to(self.device)
-        self.isolation_model.eval()
+        self.isolation_model = self._load_model(ISOLATION_MODEL_PATH)
+        
+        # Every inference path runs both models on one backend; if only one
+        # of them loaded through ONNX Runtime, fall back to PyTorch for both
+        risk_is_torch = isinstance(self.risk_model, torch.nn.Module)
+        if risk_is_torch != isinstance(self.isolation_model, torch.nn.Module):
+            logger.warning("Only one model loaded with ONNX Runtime - using PyTorch for both")
+            if risk_is_torch:
+                self.isolation_model = self._load_torch_model(ISOLATION_MODEL_PATH)
+            else:
+                self.risk_model = self._load_torch_model(RISK_MODEL_PATH)
+        
+        # ONNX Runtime (and TensorRT) graphs are already optimized;
+        # quantize/compile only apply to the PyTorch models
+        self.backend = "torch" if isinstance(self.risk_model, torch.nn.Module) else "onnxruntime"
+        logger.info(f"Inference backend: {self.backend}")
+        
+        # Both models are DistilBERT fine-tunes; if they ship the same
+        # tokenizer, encode each batch once and feed it to both models
+        self.shared_tokenizer = None
+        if self._tokenizers_match(self.risk_tokenizer, self.isolation_tokenizer):
+            self.shared_tokenizer = self.risk_tokenizer
+            logger.info("Risk and isolation tokenizers match - sharing encodings")
+        
+        # Heads trained on one frozen encoder: run it once per batch.
+        # Compared on the unquantized weights, before quantize/compile
+        self.shared_encoder = (
+            self.shared_tokenizer is not None
+            and self._encoders_match(self.risk_model, self.isolation_model)
+        )
+        if self.shared_encoder:
+            logger.info("Risk and isolation encoders match - sharing encoder forward pass")
+        
+        if self.backend == "torch" and self.device == "cpu" and self._should_quantize():
+            logger.info("Quantizing models to INT8 for CPU inference...")
+            self.risk_model = self._quantize(self.risk_model)
+            self.isolation_model = self._quantize(self.isolation_model)
+        
+        # Fixed padding lengths and batch sizes only pay off for compiled
+        # (shape-specialized) models: every (batch size, length) pair is
+        # one static graph, all of them compiled during warmup
+        self.length_buckets = None
+        self.batch_buckets = None
+        if self.backend == "torch" and INFERENCE_CONFIG['compile_models']:
+            self.length_buckets = sorted(INFERENCE_CONFIG['length_buckets'])
+            max_batch = INFERENCE_CONFIG['max_batch_size']
+            # A coarse grid keeps the number of graphs (and warmup) small
+            self.batch_buckets = sorted({b for b in (1, 4, 16) if b < max_batch} | {max_batch})
+            # Same-class models share one forward code object, so its graph
+            # cache has to hold every bucket of both models
+            compiled_modules = 1 if self.shared_encoder else 2
+            self._raise_recompile_limit(
+                len(self.batch_buckets) * len(self.length_buckets) * compiled_modules
+            )
+            if not self.shared_encoder:
+                self.risk_model = self._compile(self.risk_model)
+                self.isolation_model = self._compile(self.isolation_model)
+        
+        # Encoder run by the shared path. When compiling, compile it on its
+        # own: the submodule of a compiled model is the eager original. The
+        # classification heads (two small Linear layers each) stay eager
+        self.encoder = None
+        if self.shared_encoder:
+            self.encoder = getattr(self.risk_model, self.risk_model.base_model_prefix)
+            if self.length_buckets:
+                self.encoder = self._compile(self.encoder)
+        
+        # Reusable pinned staging buffers for H2D copies (CUDA only)
+        self._pinned = None
+        if self.device == "cuda":
+            shape = (INFERENCE_CONFIG['max_batch_size'], max(INFERENCE_CONFIG['length_buckets']))
+            self._pinned = {
+                k: torch.empty(shape, dtype=torch.long, pin_memory=True)
+                for k in ("input_ids", "attention_mask")
+            }
+            self._pinned_lock = threading.Lock()
+            self._pinned_copied = torch.cuda.Event()
         
         # Load fusion configuration
-        print("Loading fusion configuration...")
+        logger.info("Loading fusion configuration...")
         with open(FUSION_CONFIG_PATH, 'r') as f:
             self.fusion_config = json.load(f)
         
         self.thresholds = self.fusion_config['thresholds']
         self.neg_weight = self.fusion_config['risk_score']['neg_weight']
         self.risk_id2label = RISK_SETTINGS['risk_labels']
+        # Label name per output index of the risk model, and the column of
+        # each class the scoring path reads, resolved once here (None if the
+        # model has no such output; that score is then 0.0)
+        self._label_names = tuple(
+            self.risk_id2label.get(idx, f"LABEL_{idx}")
+            for idx in range(self.risk_model.config.num_labels)
+        )
+        scored_labels = ('CRAVING', 'RELAPSE', 'NEGATIVE_MOOD', 'NEUTRAL', 'TOXIC')
+        self._risk_columns = tuple(
+            self._label_names.index(name) if name in self._label_names else None
+            for name in scored_labels
+        )
+        missing = [name for name, col in zip(scored_labels, self._risk_columns) if col is None]
+        if missing:
+            logger.warning(f"Risk model has no output for {missing} - scoring them as 0.0")
+        
+        # LRU cache of per-message predictions, so re-sent messages skip inference
+        self.cache_size = INFERENCE_CONFIG['prediction_cache_size']
+        self._cache: "OrderedDict[bytes, Dict[str, float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Case only matters to the key if either model's tokenizer keeps it
+        self._lowercase_keys = all(
+            tok.init_kwargs.get("do_lower_case", False)
+            for tok in (self.risk_tokenizer, self.isolation_tokenizer)
+        )
+        
+        # Pay compile latency now rather than on the first real requests
+        if self.length_buckets:
+            self._warmup()
+        
+        logger.info("✓ All models loaded successfully")
+    
+    @staticmethod
+    def _gpu_dtype() -> torch.dtype:
+        """Resolve INFERENCE_GPU_DTYPE to a torch dtype"""
+        name = INFERENCE_CONFIG['gpu_dtype']
+        if name == 'auto':
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        
+        dtypes = {'float16': torch.float16, 'bfloat16': torch.bfloat16, 'float32': torch.float32}
+        if name not in dtypes:
+            logger.warning(f"Unknown INFERENCE_GPU_DTYPE '{name}' - using float16")
+        return dtypes.get(name, torch.float16)
+    
+    @staticmethod
+    def _configure_cpu_threads():
+        """
+        Use every core for intra-op work and a single inter-op thread
+        
+        Intra-op threads parallelize each GEMM; extra inter-op threads only
+        oversubscribe the cores the intra-op pool is already using
+        """
+        num_threads = INFERENCE_CONFIG['torch_num_threads'] or os.cpu_count() or 1
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only settable before the first parallel op in this process
+            pass
+        logger.info(f"CPU threads: {num_threads} intra-op, {torch.get_num_interop_threads()} inter-op")
+    
+    def _load_model(self, model_path: Path):
+        """Load one classifier: ONNX Runtime when enabled and available, else PyTorch"""
+        if INFERENCE_CONFIG['onnx_runtime']:
+            model = self._load_onnx_model(model_path)
+            if model is not None:
+                return model
+        return self._load_torch_model(model_path)
+    
+    def _load_torch_model(self, model_path: Path):
+        """Load one classifier as an eval-mode PyTorch model on self.device"""
+        model = AutoModelForSequenceClassification.from_pretrained(
+            str(model_path),
+            torch_dtype=self.dtype
+        ).to(self.device)
+        model.eval()
+        return model
+    
+    def _load_onnx_model(self, model_path: Path):
+        """
+        Load a classifier as an optimized ONNX Runtime model
+        
+        On first use the model is exported to ONNX and run through ORT's
+        transformer optimizer (fused attention, skip-LayerNorm and GELU);
+        the result is cached in <model_path>/onnx. Returns None if
+        optimum[onnxruntime] is missing or the export fails.
+        """
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTOptimizer
+            from optimum.onnxruntime.configuration import OptimizationConfig
+        except ImportError:
+            logger.warning("optimum[onnxruntime] not installed - using PyTorch models")
+            return None
+        
+        use_gpu = self.device == "cuda"
+        onnx_dir = Path(model_path) / "onnx"
+        optimized = onnx_dir / "model_optimized.onnx"
+        
+        use_trt = (
+            use_gpu and INFERENCE_CONFIG['tensorrt']
+            and "TensorrtExecutionProvider" in ort.get_available_providers()
+        )
+        if use_gpu and INFERENCE_CONFIG['tensorrt'] and not use_trt:
+            logger.warning("TensorRT execution provider not available - using CUDA provider")
+        
+        try:
+            if use_trt:
+                return self._load_tensorrt_model(model_path, onnx_dir, ORTModelForSequenceClassification)
+            
+            if not optimized.exists():
+                logger.info(f"Exporting {Path(model_path).name} to ONNX...")
+                exported = ORTModelForSequenceClassification.from_pretrained(str(model_path), export=True)
+                ORTOptimizer.from_pretrained(exported).optimize(
+                    save_dir=onnx_dir,
+                    optimization_config=OptimizationConfig(
+                        # 99 adds CPU-only layout optimizations
+                        optimization_level=2 if use_gpu else 99,
+                        optimize_for_gpu=use_gpu,
+                        fp16=use_gpu
+                    )
+                )
+            
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = os.cpu_count() or 1
+            options.add_session_config_entry("session.set_denormal_as_zero", "1")
+            
+            return ORTModelForSequenceClassification.from_pretrained(
+                str(onnx_dir),
+                file_name=optimized.name,
+                session_options=options,
+                provider="CUDAExecutionProvider" if use_gpu else "CPUExecutionProvider"
+            )
+        except Exception as e:
+            logger.warning(f"ONNX Runtime load failed ({e}) - using PyTorch model")
+            return None
+    
+    @staticmethod
+    def _load_tensorrt_model(model_path: Path, onnx_dir: Path, ort_model_cls):
+        """
+        Load a classifier on ONNX Runtime's TensorRT execution provider
+        
+        TensorRT does its own fusion, so it gets the plain exported graph
+        (ORT's fused contrib ops would fall back to CUDA). Building an FP16
+        engine takes minutes; engines are cached under
+        <model_path>/onnx/trt/sm<arch>_trt<version> and reused on restart.
+        """
+        plain = onnx_dir / "model.onnx"
+        if not plain.exists():
+            logger.info(f"Exporting {Path(model_path).name} to ONNX...")
+            ort_model_cls.from_pretrained(str(model_path), export=True).save_pretrained(onnx_dir)
+        
+        major, minor = torch.cuda.get_device_capability()
+        try:
+            import tensorrt
+            trt_version = tensorrt.__version__
+        except ImportError:
+            import onnxruntime as ort
+            trt_version = f"ort{ort.__version__}"
+        cache_dir = onnx_dir / "trt" / f"sm{major}{minor}_trt{trt_version}"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        logger.info(f"Loading {Path(model_path).name} on TensorRT (engine cache: {cache_dir})...")
+        return ort_model_cls.from_pretrained(
+            str(onnx_dir),
+            file_name=plain.name,
+            provider="TensorrtExecutionProvider",
+            provider_options={
+                "trt_fp16_enable": True,
+                "trt_engine_cache_enable": True,
+                "trt_engine_cache_path": str(cache_dir)
+            }
+        )
+    
+    @classmethod
+    def _should_quantize(cls) -> bool:
+        """
+        Decide whether to INT8-quantize on this CPU (QUANTIZE_INT8 setting)
+        
+        Dynamic INT8 GEMMs only beat FP32 when the CPU has int8 dot-product
+        instructions; without them quantize/dequantize overhead can make
+        inference slower, so 'auto' checks the CPU flags first.
+        """
+        mode = INFERENCE_CONFIG['quantize_cpu']
+        if mode in ('true', '1', 'yes'):
+            return True
+        if mode != 'auto':
+            return False
+        
+        int8_dot = {'avx512_vnni', 'avx_vnni', 'amx_int8', 'asimddp'}
+        return bool(cls._cpu_flags() & int8_dot)
+    
+    @staticmethod
+    def _cpu_flags() -> set:
+        """CPU feature flags from /proc/cpuinfo (empty if it can't be read)"""
+        try:
+            with open('/proc/cpuinfo') as f:
+                return set(f.read().split())
+        except OSError:
+            return set()
+    
+    @staticmethod
+    def _quantize(model):
+        """
+        Dynamic INT8 quantization of the transformer's Linear layers
+        Weights are stored as int8 and activations quantized per batch
+        """
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    def _compile(self, model):
+        """
+        Compile a model for inference with torch.compile (PyTorch 2.x)
+        
+        CUDA graphs ("reduce-overhead") remove per-kernel launch cost on GPU;
+        on CPU the default mode still fuses ops and drops Python dispatch
+        """
+        version = tuple(int(part) for part in torch.__version__.split(".")[:2])
+        if version < (2, 1):
+            logger.warning(f"torch.compile needs PyTorch >= 2.1 (found {torch.__version__}) - running eager models")
+            return model
+        mode = "reduce-overhead" if self.device == "cuda" else "default"
+        logger.info(f"Compiling {type(model).__name__} (mode={mode})...")
+        # Static shapes: batches are padded to fixed (batch, length) buckets,
+        # so each bucket keeps its own specialized graph
+        return torch.compile(model, mode=mode, fullgraph=False, dynamic=False)
+    
+    @staticmethod
+    def _raise_recompile_limit(graphs: int):
+        """
+        Let dynamo keep `graphs` static graphs per code object
+        
+        Past the limit (default 8) dynamo stops recompiling and runs the
+        frame eagerly, which would silently undo the bucket compilation
+        """
+        try:
+            import torch._dynamo
+        except ImportError:
+            return
+        config = torch._dynamo.config
+        # Renamed to recompile_limit in newer PyTorch releases
+        for name in ("cache_size_limit", "recompile_limit"):
+            if hasattr(config, name):
+                setattr(config, name, max(getattr(config, name), graphs))
+    
+    def _warmup(self):
+        """
+        Run every (batch size, length) bucket through the compiled models
+        
+        Each bucket is its own compiled graph (and CUDA graph capture on
+        GPU, which records on the second run), so two dummy batches per
+        bucket leave nothing to compile on the request path
+        """
+        logger.info(
+            f"Warming up compiled models ({len(self.batch_buckets)} batch sizes x "
+            f"{len(self.length_buckets)} length buckets)..."
+        )
+        for bucket in self.length_buckets:
+            # One token per "a": truncation leaves exactly `bucket` tokens
+            dummy = "a " * bucket
+            for batch_size in self.batch_buckets:
+                for _ in range(2):
+                    self._score_table([dummy] * batch_size, bucket)
+    
+    @staticmethod
+    def _tokenizers_match(a, b) -> bool:
+        """Check whether two tokenizers produce identical encodings"""
+        if type(a) is not type(b):
+            return False
+        if getattr(a, "is_fast", False) and getattr(b, "is_fast", False):
+            # Serialized Rust tokenizer covers vocab, normalizer and pre-tokenizer
+            return a.backend_tokenizer.to_str() == b.backend_tokenizer.to_str()
+        return a.get_vocab() == b.get_vocab()
+    
+    @staticmethod
+    def _encoders_match(a, b) -> bool:
+        """Check whether two DistilBERT classifiers have identical encoder weights"""
+        if not (isinstance(a, torch.nn.Module) and isinstance(b, torch.nn.Module)):
+            return False
+        if type(a) is not type(b) or not hasattr(a, "pre_classifier"):
+            return False
         
-        print("✓ All models loaded successfully")
+        enc_a = getattr(a, a.base_model_prefix).state_dict()
+        enc_b = getattr(b, b.base_model_prefix).state_dict()
+        return enc_a.keys() == enc_b.keys() and all(torch.equal(enc_a[k], enc_b[k]) for k in enc_a)
     
     @staticmethod
-    def softmax(x: np.ndarray) -> np.ndarray:
-        """Apply softmax to logits"""
-        e = np.exp(x - np.max(x))
-        return e / e.sum()
+    def _classifier_head(model, hidden: torch.Tensor) -> torch.Tensor:
+        """DistilBERT classification head: [CLS] -> pre_classifier -> ReLU -> classifier"""
+        pooled = torch.relu(model.pre_classifier(hidden[:, 0]))
+        return model.classifier(pooled)
     
-    @torch.no_grad()
+    def _encode(self, tokenizer, texts: List[str], max_length: int) -> Dict[str, torch.Tensor]:
+        """Tokenize a batch of texts and move the padded tensors to the model device"""
+        return self._collate(self._tokenize(tokenizer, texts, max_length), tokenizer.pad_token_id)
+    
+    @staticmethod
+    def _tokenize(tokenizer, texts: List[str], max_length: int) -> List[List[int]]:
+        """Tokenize a batch of texts into unpadded input_ids"""
+        # Tokens are never shorter than a character, and rarely cover more
+        # than a few, so anything past max_length * 6 chars is truncated
+        # anyway - cut it before the tokenizer has to normalize it
+        char_limit = max_length * 6
+        texts = [t[:char_limit] for t in texts]
+        return tokenizer(
+            texts,
+            truncation=True,
+            max_length=max_length,
+            return_attention_mask=False
+        )["input_ids"]
+    
+    def _collate(self, input_ids: List[List[int]], pad_token_id: int) -> Dict[str, torch.Tensor]:
+        """
+        Right-pad token ids to one length and move them to the model device
+        
+        The length is the longest sequence, rounded up to a multiple of 8
+        on GPU (tensor-core friendly) and, for compiled models, to the
+        smallest length bucket that fits. Compiled models also get the
+        batch padded to a batch-size bucket with filler rows (just [CLS]
+        attended), which callers drop from the output
+        """
+        length = max(len(seq) for seq in input_ids)
+        if self.device == "cuda":
+            length = -(-length // 8) * 8
+        rows = len(input_ids)
+        if self.length_buckets:
+            length = next((b for b in self.length_buckets if b >= length), length)
+            rows = next((b for b in self.batch_buckets if b >= rows), rows)
+        
+        ids = torch.full((rows, length), pad_token_id, dtype=torch.long)
+        mask = torch.zeros((rows, length), dtype=torch.long)
+        mask[len(input_ids):, 0] = 1
+        for row, seq in enumerate(input_ids):
+            ids[row, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+            mask[row, :len(seq)] = 1
+        return self._to_device({"input_ids": ids, "attention_mask": mask})
+    
+    @staticmethod
+    def _length_groups(input_ids: List[List[int]]) -> List[List[int]]:
+        """
+        Split batch positions into token-length groups (batch_length_buckets)
+        
+        Each group is padded and run separately, so one long message does
+        not pad every short one in the batch up to its length
+        """
+        bounds = sorted(INFERENCE_CONFIG['batch_length_buckets'])
+        groups: Dict[int, List[int]] = {}
+        for i, seq in enumerate(input_ids):
+            bucket = next((j for j, bound in enumerate(bounds) if len(seq) <= bound), len(bounds))
+            groups.setdefault(bucket, []).append(i)
+        return [groups[bucket] for bucket in sorted(groups)]
+    
+    def _to_device(self, encoded) -> Dict[str, torch.Tensor]:
+        """
+        Move encoded tensors to the model device
+        
+        On CUDA the tensors are staged in pinned memory and copied with
+        non_blocking=True so the H2D transfer overlaps with kernel launch.
+        Batches that fit go through the preallocated staging buffers,
+        so there is no per-call pinned allocation.
+        """
+        if self.device != "cuda":
+            return {k: v.to(self.device) for k, v in encoded.items()}
+        
+        n, length = encoded["input_ids"].shape
+        buf_n, buf_len = self._pinned["input_ids"].shape
+        if encoded.keys() != self._pinned.keys() or n > buf_n or length > buf_len:
+            return {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in encoded.items()}
+        
+        with self._pinned_lock:
+            # The previous async copy must finish reading the buffers
+            # before they are overwritten
+            self._pinned_copied.synchronize()
+            on_device = {}
+            for k, v in encoded.items():
+                # Contiguous prefix of the flat buffer: a [:n, :length]
+                # slice is strided, and .to() would first copy it into
+                # pageable memory
+                staged = self._pinned[k].view(-1)[:n * length].view(n, length)
+                staged.copy_(v)
+                on_device[k] = staged.to(self.device, non_blocking=True)
+            self._pinned_copied.record()
+        return on_device
+    
+    @torch.inference_mode()
     def predict_risk_probabilities(self, text: str, max_length: int = 256) -> Dict[str, float]:
         """
         Run risk classification model on text
@@ -72,28 +551,16 @@ class RiskAnalyzer:
             Dict with probabilities for each risk class
         """
         # Tokenize
-        encoded = self.risk_tokenizer(
-            text,
-            truncation=True,
-            padding=True,
-            max_length=max_length,
-            return_tensors="pt"
-        )
-        encoded = {k: v.to(self.device) for k, v in encoded.items()}
+        encoded = self._encode(self.risk_tokenizer, [text], max_length)
         
-        # Predict
-        logits = self.risk_model(**encoded).logits.detach().cpu().numpy()[0]
-        probs = self.softmax(logits)
+        # Predict (softmax on the model device, one copy back to host)
+        logits = self.risk_model(**encoded).logits.float()
+        probs = torch.softmax(logits, dim=-1)[0].cpu().tolist()
         
         # Map to labels
-        result = {}
-        for idx, prob in enumerate(probs):
-            label = self.risk_id2label.get(idx, f"LABEL_{idx}")
-            result[label] = float(prob)
-        
-        return result
+        return dict(zip(self._label_names, probs))
     
-    @torch.no_grad()
+    @torch.inference_mode()
     def predict_isolation_probability(self, text: str, max_length: int = 256) -> float:
         """
         Run isolation detection model on text
@@ -106,25 +573,18 @@ class RiskAnalyzer:
             Probability of isolation (0.0 to 1.0)
         """
         # Tokenize
-        encoded = self.isolation_tokenizer(
-            text,
-            truncation=True,
-            padding=True,
-            max_length=max_length,
-            return_tensors="pt"
-        )
-        encoded = {k: v.to(self.device) for k, v in encoded.items()}
+        encoded = self._encode(self.isolation_tokenizer, [text], max_length)
         
-        # Predict
-        logits = self.isolation_model(**encoded).logits.detach().cpu().numpy()[0]
-        probs = self.softmax(logits)
+        # Predict (softmax on the model device, one copy back to host)
+        logits = self.isolation_model(**encoded).logits.float()
+        probs = torch.softmax(logits, dim=-1)[0].cpu().tolist()
         
         # Binary classification: index 1 is "ISOLATION"
         if len(probs) == 2:
             return float(probs[1])
         
         # Fallback if unexpected output
-        return float(np.max(probs))
+        return float(max(probs))
     
     def compute_risk_score(
         self,
@@ -150,6 +610,196 @@ class RiskAnalyzer:
             self.neg_weight * p_negative_mood
         ))
     
+    def analyze_messages(self, texts: List[str], max_length: int = 256) -> List[Dict[str, float]]:
+        """
+        Batched analysis pipeline for a list of messages
+        
+        Messages already in the prediction cache are served from it; the
+        remaining ones are deduplicated and scored together in a single batch
+        
+        Args:
+            texts: User messages
+            max_length: Max token length
+            
+        Returns:
+            One prediction dict per message, in input order
+        """
+        texts = list(texts)
+        results: List[Optional[Dict[str, float]]] = [None] * len(texts)
+        keys = [self._cache_key(text, max_length) for text in texts]
+        # Uncached key -> positions in this batch (identical messages are scored once)
+        misses: "OrderedDict[bytes, List[int]]" = OrderedDict()
+        
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    misses.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    results[i] = dict(cached)
+            missed = sum(len(positions) for positions in misses.values())
+            self.cache_hits += len(texts) - missed
+            self.cache_misses += missed
+        
+        if misses:
+            unique_texts = [texts[positions[0]] for positions in misses.values()]
+            scored = self._score_batch(unique_texts, max_length)
+            with self._cache_lock:
+                for (key, positions), prediction in zip(misses.items(), scored):
+                    for i in positions:
+                        results[i] = dict(prediction)
+                    if self.cache_size > 0:
+                        self._cache[key] = prediction
+                        if len(self._cache) > self.cache_size:
+                            self._cache.popitem(last=False)
+        
+        return results
+    
+    def _cache_key(self, text: str, max_length: int) -> bytes:
+        """
+        Normalize a message into a prediction-cache key
+        
+        Whitespace runs are collapsed (the tokenizers split on whitespace
+        anyway) and case is folded only for lowercasing tokenizers, so two
+        messages share a key only if they encode identically. The key is a
+        16-byte BLAKE2b digest, so the cache does not hold message text
+        """
+        normalized = " ".join(text.split())
+        if self._lowercase_keys:
+            normalized = normalized.lower()
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16)
+        digest.update(max_length.to_bytes(4, "little"))
+        return digest.digest()
+    
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Prediction cache counters, for monitoring the hit rate"""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': self.cache_hits / lookups if lookups else 0.0
+            }
+    
+    def score_messages(self, texts: List[str], max_length: int = 256) -> Dict[str, np.ndarray]:
+        """
+        Score a batch of messages as column arrays (struct-of-arrays)
+        
+        Skips the prediction cache and never builds per-message dicts, so
+        bulk callers can reduce whole columns (max/mean/thresholds) directly
+        
+        Args:
+            texts: User messages
+            max_length: Max token length
+            
+        Returns:
+            Dict mapping each PREDICTION_FIELDS name to a float array of shape [N]
+        """
+        table = self._score_table(list(texts), max_length)
+        return {name: table[:, col] for col, name in enumerate(PREDICTION_FIELDS)}
+    
+    def _score_batch(self, texts: List[str], max_length: int) -> List[Dict[str, float]]:
+        """Score a batch and return one prediction dict per message"""
+        rows = self._score_table(texts, max_length).tolist()
+        return [dict(zip(PREDICTION_FIELDS, row)) for row in rows]
+    
+    def _score_table(self, texts: List[str], max_length: int) -> np.ndarray:
+        """
+        Tokenize the whole list once per model and score it in a few
+        batched forward passes (one per token-length group), instead of
+        2 x N batch-size-1 calls
+        
+        Args:
+            texts: User messages
+            max_length: Max token length
+            
+        Returns:
+            Array of shape [N, len(PREDICTION_FIELDS)], columns in PREDICTION_FIELDS order
+        """
+        if not texts:
+            return np.zeros((0, len(PREDICTION_FIELDS)), dtype=np.float32)
+        
+        risk_ids = self._tokenize(self.shared_tokenizer or self.risk_tokenizer, texts, max_length)
+        iso_ids = risk_ids
+        if self.shared_tokenizer is None:
+            iso_ids = self._tokenize(self.isolation_tokenizer, texts, max_length)
+        
+        groups = self._length_groups(risk_ids)
+        if self.batch_buckets:
+            # Compiled graphs only exist up to the largest batch bucket
+            step = self.batch_buckets[-1]
+            groups = [g[i:i + step] for g in groups for i in range(0, len(g), step)]
+        if len(groups) == 1:
+            return self._forward(risk_ids, iso_ids)
+        
+        # Score each length group separately and scatter back into input order
+        table = np.empty((len(texts), len(PREDICTION_FIELDS)), dtype=np.float32)
+        for positions in groups:
+            table[positions] = self._forward(
+                [risk_ids[i] for i in positions],
+                [iso_ids[i] for i in positions]
+            )
+        return table
+    
+    @torch.inference_mode()
+    def _forward(self, risk_ids: List[List[int]], iso_ids: List[List[int]]) -> np.ndarray:
+        """Run both classifiers over one batch of token ids -> [N, len(PREDICTION_FIELDS)]"""
+        tokenizer = self.shared_tokenizer or self.risk_tokenizer
+        encoded = self._collate(risk_ids, tokenizer.pad_token_id)
+        
+        if self.shared_encoder:
+            # One encoder pass feeding both classification heads
+            hidden = self.encoder(**encoded)[0]
+            risk_logits = self._classifier_head(self.risk_model, hidden)
+            iso_logits = self._classifier_head(self.isolation_model, hidden)
+        else:
+            # Risk model: one forward pass over the whole batch -> [N, num_labels]
+            risk_logits = self.risk_model(**encoded).logits
+            
+            # Isolation model: one forward pass over the whole batch -> [N, 2]
+            if self.shared_tokenizer is None:
+                encoded = self._collate(iso_ids, self.isolation_tokenizer.pad_token_id)
+            iso_logits = self.isolation_model(**encoded).logits
+        
+        risk_probs = torch.softmax(risk_logits.float(), dim=-1)
+        iso_probs = torch.softmax(iso_logits.float(), dim=-1)
+        
+        # Binary classification: index 1 is "ISOLATION"
+        if iso_probs.shape[1] == 2:
+            p_isolation = iso_probs[:, 1]
+        else:
+            p_isolation = iso_probs.max(dim=1).values
+        
+        craving, relapse, negative_mood, neutral, toxic = self._risk_columns
+        p_craving = self._column(risk_probs, craving)
+        p_relapse = self._column(risk_probs, relapse)
+        p_negative_mood = self._column(risk_probs, negative_mood)
+        
+        # Fusion formula evaluated on-device for every row
+        risk_score = torch.maximum(
+            torch.maximum(p_relapse, p_craving),
+            self.neg_weight * p_negative_mood
+        )
+        
+        # Single device -> host transfer for the whole batch (minus filler rows)
+        return torch.stack([
+            p_craving,
+            p_relapse,
+            p_negative_mood,
+            self._column(risk_probs, neutral),
+            self._column(risk_probs, toxic),
+            p_isolation,
+            risk_score
+        ], dim=1)[:len(risk_ids)].cpu().numpy()
+    
+    @staticmethod
+    def _column(probs: torch.Tensor, col: Optional[int]) -> torch.Tensor:
+        """One class column of a [N, num_labels] batch (zeros if the model lacks it)"""
+        return probs[:, col] if col is not None else probs.new_zeros(probs.shape[0])
+    
     def analyze_message(self, text: str) -> Dict[str, float]:
         """
         Complete analysis pipeline for a single message
@@ -160,30 +810,7 @@ class RiskAnalyzer:
         Returns:
             Dict with all predictions ready for database storage
         """
-        # Run both models
-        risk_probs = self.predict_risk_probabilities(text)
-        p_isolation = self.predict_isolation_probability(text)
-        
-        # Extract specific probabilities
-        p_craving = risk_probs.get('CRAVING', 0.0)
-        p_relapse = risk_probs.get('RELAPSE', 0.0)
-        p_negative_mood = risk_probs.get('NEGATIVE_MOOD', 0.0)
-        p_neutral = risk_probs.get('NEUTRAL', 0.0)
-        p_toxic = risk_probs.get('TOXIC', 0.0)
-        
-        # Compute risk score
-        risk_score = self.compute_risk_score(p_relapse, p_craving, p_negative_mood)
-        
-        # Return complete prediction
-        return {
-            'p_craving': p_craving,
-            'p_relapse': p_relapse,
-            'p_negative_mood': p_negative_mood,
-            'p_neutral': p_neutral,
-            'p_toxic': p_toxic,
-            'p_isolation': p_isolation,
-            'risk_score': risk_score
-        }
+        return self.analyze_messages([text])[0]
     
     def get_thresholds(self) -> Dict[str, float]:
         """Get fusion thresholds for temporal engine"""
@@ -192,20 +819,26 @@ class RiskAnalyzer:
 
 # Singleton instance (load models once)
 _analyzer_instance = None
+_analyzer_lock = threading.Lock()
 
 def get_analyzer() -> RiskAnalyzer:
     """
     Get or create the risk analyzer instance
-    This ensures models are loaded only once
+    This ensures models are loaded only once, also when the first
+    requests arrive concurrently on threadpool/executor threads
     """
     global _analyzer_instance
     if _analyzer_instance is None:
-        _analyzer_instance = RiskAnalyzer()
+        with _analyzer_lock:
+            if _analyzer_instance is None:
+                _analyzer_instance = RiskAnalyzer()
     return _analyzer_instance
 
 
 # Test function
 if __name__ == "__main__":
+    # Run from services/social_service: python -m ml.risk_analyzer
+    logging.basicConfig(level=logging.INFO)
     print("=" * 80)
     print("RISK ANALYZER TEST")
     print("=" * 80)
@@ -223,9 +856,8 @@ if __name__ == "__main__":
     
     print("\nAnalyzing test messages:\n")
     
-    for msg in test_messages:
+    for msg, predictions in zip(test_messages, analyzer.analyze_messages(test_messages)):
         print(f"Message: '{msg}'")
-        predictions = analyzer.analyze_message(msg)
         
         print(f"  Risk Score: {predictions['risk_score']:.3f}")
         print(f"  P(Craving): {predictions['p_craving']:.3f}")
@@ -38,18 +38,25 @@ print("=" * 80)
 print("INTERVENTION AGENT TEST")
 print("=" * 80)
 
-# Store messages over time
+now = datetime.now()
+
+# Backfill older, calmer history (COPY-based bulk load)
+history = [
+    (user_id, "Good day at the meeting", {'p_craving': 0.05, 'p_relapse': 0.05, 'p_negative_mood': 0.1,
+                                          'p_toxic': 0.0, 'p_isolation': 0.2, 'risk_score': 0.05},
+     'buddy', now - timedelta(days=days))
+    for days in (20, 15, 10)
+]
+loaded = engine.bulk_load_messages(history)
+print(f"\nBackfilled {loaded} historical messages")
+
+# Store messages over time (one batched write)
+engine.store_messages_with_predictions_batch([
+    (user_id, text, predictions, 'buddy', now - timedelta(days=len(test_messages)-i-1))
+    for i, (text, predictions) in enumerate(test_messages)
+])
+
 for i, (text, predictions) in enumerate(test_messages):
-    ts = datetime.now() - timedelta(days=len(test_messages)-i-1)
-    
-    msg_id, pred_id = engine.store_message_with_prediction(
-        user_id=user_id,
-        message_text=text,
-        predictions=predictions,
-        conversation_type='buddy',
-        timestamp=ts
-    )
-    
     print(f"\nDay {i+1}: '{text}'")
     print(f"  Risk Score: {predictions['risk_score']:.3f}")
 
@@ -58,7 +65,7 @@ print("\n" + "=" * 80)
 print("COMPUTING RISK PROFILE")
 print("=" * 80)
 
-profile = engine.update_user_risk_profile(user_id, thresholds)
+profile, = engine.update_user_risk_profiles_bulk([user_id], thresholds)
 
 print(f"\nUser: {profile['user_id']}")
 print(f"Risk Label: {profile['current_risk_label']}")
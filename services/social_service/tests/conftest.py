@@ -0,0 +1,14 @@
+"""
+Shared test setup for the social service
+
+The service imports its packages top-level (from db..., from ml...),
+so the service directory goes on sys.path like when running main.py.
+"""
+
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
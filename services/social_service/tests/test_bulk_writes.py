@@ -0,0 +1,113 @@
+"""
+Round trip of the bulk write paths against a real database
+
+Writes rows for a throwaway user and deletes the user afterwards
+(everything else cascades). Opt-in: set SOCIAL_DB_TESTS=1 and the usual
+DB_* variables to point at a database created from database/init.sql.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+if os.getenv("SOCIAL_DB_TESTS") != "1":
+    pytest.skip("set SOCIAL_DB_TESTS=1 to run database tests", allow_module_level=True)
+
+from core.config import DB_CONFIG, SOCIAL_SCHEMA
+from db.temporal_engine import PREDICTION_COLUMNS, PROB_SCALE, TemporalRiskEngine
+
+
+THRESHOLDS = {'T_high': 0.7, 'T_mid': 0.3, 'T_relapse': 0.5, 'T_craving': 0.5}
+
+LOW = {'p_craving': 0.05, 'p_relapse': 0.05, 'p_negative_mood': 0.1,
+       'p_toxic': 0.0, 'p_isolation': 0.2, 'risk_score': 0.05}
+HIGH = {'p_craving': 0.85, 'p_relapse': 0.3, 'p_negative_mood': 0.5,
+        'p_toxic': 0.0, 'p_isolation': 0.6, 'risk_score': 0.85}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = TemporalRiskEngine(
+        host=DB_CONFIG['host'],
+        port=DB_CONFIG['port'],
+        database=DB_CONFIG['database'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        max_conn=2,
+        schema=SOCIAL_SCHEMA
+    )
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def user_id(engine):
+    user_id = f"test_bulk_{uuid.uuid4().hex[:12]}"
+    engine.ensure_user_exists(user_id)
+    yield user_id
+    with engine.get_cursor() as cursor:
+        cursor.execute("DELETE FROM core.users WHERE user_id = %s", (user_id,))
+
+
+def stored_predictions(engine, user_id):
+    with engine.get_cursor() as cursor:
+        cursor.execute(f"""
+            SELECT m.message_text, m.conversation_type, {', '.join(f'p.{c}' for c in PREDICTION_COLUMNS)}
+            FROM {engine.schema}.message_predictions p
+            JOIN core.messages m ON m.message_id = p.message_id
+            WHERE p.user_id = %s
+            ORDER BY p.timestamp
+        """, (user_id,))
+        return cursor.fetchall()
+
+
+def test_bulk_load_messages_round_trip(engine, user_id):
+    now = datetime.now()
+    rows = [
+        (user_id, 'first, with "quotes"', LOW, 'buddy', now - timedelta(days=3)),
+        (user_id, "second\nline", HIGH, 'counselor', now - timedelta(days=1)),
+    ]
+    
+    assert engine.bulk_load_messages(rows) == 2
+    
+    stored = stored_predictions(engine, user_id)
+    assert [r['message_text'] for r in stored] == ['first, with "quotes"', "second\nline"]
+    assert [r['conversation_type'] for r in stored] == ['buddy', 'counselor']
+    for row, (_, _, predictions, _, _) in zip(stored, rows):
+        for col in PREDICTION_COLUMNS:
+            assert row[col] == round(predictions[col] * PROB_SCALE)
+
+
+def test_bulk_load_messages_empty(engine):
+    assert engine.bulk_load_messages([]) == 0
+
+
+def test_update_user_risk_profiles_bulk_matches_single(engine, user_id):
+    now = datetime.now()
+    engine.store_messages_with_predictions_batch([
+        (user_id, "fine", LOW, 'buddy', now - timedelta(days=2)),
+        (user_id, "craving", HIGH, 'buddy', now - timedelta(hours=1)),
+    ])
+    silent_user = f"{user_id}_silent"
+    
+    profiles = engine.update_user_risk_profiles_bulk(
+        [user_id, silent_user, user_id], THRESHOLDS
+    )
+    
+    assert [p['user_id'] for p in profiles] == [user_id, silent_user]
+    assert profiles[1]['reasons'] == ['No message history']
+    
+    single = engine.update_user_risk_profile(user_id, THRESHOLDS)
+    assert profiles[0]['current_risk_label'] == single['current_risk_label']
+    assert profiles[0]['risk_label_since'] == single['risk_label_since']
+    
+    with engine.get_cursor() as cursor:
+        cursor.execute(
+            f"SELECT current_risk_label FROM {engine.schema}.user_risk_profiles WHERE user_id = %s",
+            (user_id,)
+        )
+        assert cursor.fetchone()['current_risk_label'] == single['current_risk_label']
@@ -0,0 +1,83 @@
+"""
+Unit tests for the RiskAnalyzer hardware/config decisions (INT8, GPU dtype)
+
+No models are loaded: the static helpers are called directly with the
+CPU flags, CUDA capabilities and INFERENCE_CONFIG monkeypatched.
+"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from ml import risk_analyzer
+from ml.risk_analyzer import RiskAnalyzer
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Set INFERENCE_CONFIG entries for one test"""
+    def set_option(key, value):
+        monkeypatch.setitem(risk_analyzer.INFERENCE_CONFIG, key, value)
+    return set_option
+
+
+@pytest.fixture
+def cpu_flags(monkeypatch):
+    """Pretend the CPU reports the given /proc/cpuinfo flags"""
+    def set_flags(*flags):
+        monkeypatch.setattr(RiskAnalyzer, "_cpu_flags", staticmethod(lambda: set(flags)))
+    return set_flags
+
+
+@pytest.mark.parametrize("flag", ["avx512_vnni", "avx_vnni", "amx_int8", "asimddp"])
+def test_auto_quantizes_with_int8_dot_product(config, cpu_flags, flag):
+    config('quantize_cpu', 'auto')
+    cpu_flags("fpu", "sse4_2", "avx2", flag)
+    assert RiskAnalyzer._should_quantize() is True
+
+
+def test_auto_skips_quantize_without_int8_dot_product(config, cpu_flags):
+    config('quantize_cpu', 'auto')
+    cpu_flags("fpu", "sse4_2", "avx2", "avx512f")
+    assert RiskAnalyzer._should_quantize() is False
+
+
+def test_auto_skips_quantize_when_cpuinfo_unreadable(config, cpu_flags):
+    config('quantize_cpu', 'auto')
+    cpu_flags()
+    assert RiskAnalyzer._should_quantize() is False
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ('true', True), ('1', True), ('yes', True), ('false', False), ('0', False)
+])
+def test_explicit_quantize_setting_ignores_cpu_flags(config, cpu_flags, mode, expected):
+    config('quantize_cpu', mode)
+    cpu_flags("avx512_vnni")
+    assert RiskAnalyzer._should_quantize() is expected
+
+
+@pytest.mark.parametrize("bf16_supported, expected", [
+    (True, torch.bfloat16), (False, torch.float16)
+])
+def test_auto_gpu_dtype_prefers_bf16_when_supported(config, monkeypatch, bf16_supported, expected):
+    config('gpu_dtype', 'auto')
+    monkeypatch.setattr(torch.cuda, "is_bf16_supported", lambda: bf16_supported)
+    assert RiskAnalyzer._gpu_dtype() is expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ('float16', torch.float16), ('bfloat16', torch.bfloat16), ('float32', torch.float32)
+])
+def test_named_gpu_dtype(config, monkeypatch, name, expected):
+    config('gpu_dtype', name)
+    monkeypatch.setattr(torch.cuda, "is_bf16_supported", lambda: pytest.fail("not an 'auto' lookup"))
+    assert RiskAnalyzer._gpu_dtype() is expected
+
+
+def test_unknown_gpu_dtype_falls_back_to_float16(config, caplog):
+    config('gpu_dtype', 'float8')
+    with caplog.at_level("WARNING", logger=risk_analyzer.__name__):
+        assert RiskAnalyzer._gpu_dtype() is torch.float16
+    assert "Unknown INFERENCE_GPU_DTYPE 'float8'" in caplog.text
@@ -3,7 +3,7 @@ from typing import Optional, Dict, Any
 
 from jose import jwt
 from passlib.context import CryptContext
-from shared.core.settings import settings
+from shared.core.settings import get_settings
 
 # ✅ No bcrypt. No 72-byte issues. No bcrypt backend warnings.
 _pwd = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
@@ -22,8 +22,10 @@ def create_access_token(user_id: str, expires_minutes: int = 60) -> str:
         "sub": user_id,
         "exp": datetime.utcnow() + timedelta(minutes=expires_minutes),
     }
+    settings = get_settings()
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
 
 def decode_token(token: str) -> Dict[str, Any]:
+    settings = get_settings()
     return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
\ No newline at end of file
@@ -2,10 +2,11 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Optional
 
-from shared.core.settings import settings
+from shared.core.settings import get_settings
 
 
 def _conn():
+    settings = get_settings()
     return psycopg2.connect(
         host=settings.DB_HOST,
         port=settings.DB_PORT,
@@ -3,49 +3,59 @@ Shared settings module - loads environment variables and provides common configu
 Used by all services in the Recoverly platform
 """
 
-import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# .env at the backend root
 env_path = Path(__file__).parent.parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
 
 
-class Settings:
+class Settings(BaseSettings):
     """Base settings class that all services can inherit from"""
     
+    model_config = SettingsConfigDict(env_file=env_path, extra="ignore")
+    
     # Database Configuration
-    DB_HOST: str = os.getenv("DB_HOST", "localhost")
-    DB_PORT: int = int(os.getenv("DB_PORT", "5432"))
-    DB_NAME: str = os.getenv("DB_NAME", "recoverly_platform")
-    DB_USER: str = os.getenv("DB_USER", "postgres")
-    DB_PASSWORD: str = os.getenv("DB_PASSWORD", "user")
-    DB_MIN_CONN: int = int(os.getenv("DB_MIN_CONN", "2"))
-    DB_MAX_CONN: int = int(os.getenv("DB_MAX_CONN", "10"))
+    DB_HOST: str = "localhost"
+    DB_PORT: int = 5432
+    DB_NAME: str = "recoverly_platform"
+    DB_USER: str = "postgres"
+    DB_PASSWORD: str = "user"
+    DB_MIN_CONN: int = 2
+    DB_MAX_CONN: int = 10
+    # No client-side pooling (e.g. behind PgBouncer, or many service replicas)
+    DB_NULL_POOL: bool = False
+    # Also create the sync (psycopg2) engine, for scripts/CLIs
+    DB_SYNC_ENGINE: bool = False
     
     # Environment
-    ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    ENVIRONMENT: str = "development"
+    LOG_LEVEL: str = "INFO"
     
     # ML Models
-    MODELS_DIR: str = os.getenv("MODELS_DIR", "./models")
+    MODELS_DIR: str = "./models"
     
     # API Configuration
-    API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
-    API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
 
     # JWT Auth
-    JWT_SECRET: str = os.getenv("JWT_SECRET", "dev_change_me")
-    JWT_ALG: str = os.getenv("JWT_ALG", "HS256")
-    JWT_EXPIRES_MIN: int = int(os.getenv("JWT_EXPIRES_MIN", "43200"))
+    JWT_SECRET: str = "dev_change_me"
+    JWT_ALG: str = "HS256"
+    JWT_EXPIRES_MIN: int = 43200
     
     @property
     def database_url(self) -> str:
         """PostgreSQL connection URL"""
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
+    @property
+    def async_database_url(self) -> str:
+        """PostgreSQL connection URL for the asyncpg driver"""
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+    
     @property
     def is_development(self) -> bool:
         """Check if running in development mode"""
@@ -57,5 +67,10 @@ class Settings:
         return self.ENVIRONMENT == "production"
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Settings instance, read from the environment/.env on first call
+    Tests can override it with get_settings.cache_clear()
+    """
+    return Settings()
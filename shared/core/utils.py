@@ -2,10 +2,12 @@
 Common utility functions shared across all services
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 import logging
 
+_UTC = timezone.utc
+
 
 def setup_logging(service_name: str, log_level: str = "INFO") -> logging.Logger:
     """
@@ -32,11 +34,26 @@ def setup_logging(service_name: str, log_level: str = "INFO") -> logging.Logger:
     return logger
 
 
-def calculate_days_ago(timestamp: datetime) -> int:
-    """Calculate how many days ago a timestamp was"""
+def now_utc() -> datetime:
+    """Current time as a timezone-aware UTC datetime"""
+    return datetime.now(_UTC)
+
+
+def calculate_days_ago(timestamp: datetime, now: Optional[datetime] = None) -> int:
+    """
+    Calculate how many days ago a timestamp was
+    
+    Pass `now` (from now_utc()) when calling in a loop so every row is
+    measured against the same instant. Naive timestamps are treated as
+    server local time, as before.
+    """
     if timestamp is None:
         return -1
-    return (datetime.now() - timestamp).days
+    if now is None:
+        now = now_utc()
+    if timestamp.tzinfo is None:
+        now = now.astimezone().replace(tzinfo=None)
+    return (now - timestamp).days
 
 
 def format_timestamp(dt: Optional[datetime]) -> Optional[str]:
@@ -54,9 +71,9 @@ def parse_timestamp(timestamp_str: Optional[str]) -> Optional[datetime]:
         return None
 
 
-def get_time_window_start(days: int) -> datetime:
-    """Get the start datetime for a time window"""
-    return datetime.now() - timedelta(days=days)
+def get_time_window_start(days: int, now: Optional[datetime] = None) -> datetime:
+    """Get the start datetime (UTC) for a time window"""
+    return (now or now_utc()) - timedelta(days=days)
 
 
 def safe_divide(numerator: float, denominator: float, default: float = 0.0) -> float:
@@ -2,35 +2,89 @@
 Shared database base classes and utilities
 """
 
+from functools import lru_cache
+from typing import AsyncIterator, Iterator
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from shared.core.settings import settings
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from shared.core.settings import get_settings
 
 # SQLAlchemy Base for all models
 Base = declarative_base()
 
-# Database engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_size=settings.DB_MIN_CONN,
-    max_overflow=settings.DB_MAX_CONN - settings.DB_MIN_CONN,
-)
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines and session factories are built on first use, not at import,
+# so importing models (Base) never touches settings or the database
+
+@lru_cache
+def get_engine() -> AsyncEngine:
+    """Async database engine (asyncpg) - DB IO doesn't block the event loop"""
+    settings = get_settings()
+    if settings.DB_NULL_POOL:
+        return create_async_engine(settings.async_database_url, poolclass=NullPool)
+    return create_async_engine(
+        settings.async_database_url,
+        pool_pre_ping=True,
+        pool_size=settings.DB_MIN_CONN,
+        max_overflow=settings.DB_MAX_CONN - settings.DB_MIN_CONN,
+    )
+
+
+@lru_cache
+def get_sessionmaker() -> async_sessionmaker:
+    """Async session factory bound to get_engine()"""
+    return async_sessionmaker(bind=get_engine(), class_=AsyncSession, expire_on_commit=False)
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """New async session"""
+    return get_sessionmaker()()
+
 
+@lru_cache
+def get_sync_engine() -> Engine:
+    """Sync (psycopg2) engine for scripts/CLIs; requires DB_SYNC_ENGINE=true"""
+    settings = get_settings()
+    if not settings.DB_SYNC_ENGINE:
+        raise RuntimeError("Sync database engine is disabled - set DB_SYNC_ENGINE=true")
+    return create_engine(
+        settings.database_url,
+        pool_pre_ping=True,
+        pool_size=settings.DB_MIN_CONN,
+        max_overflow=settings.DB_MAX_CONN - settings.DB_MIN_CONN,
+    )
 
-def get_db():
+
+@lru_cache
+def get_sync_sessionmaker() -> sessionmaker:
+    """Sync session factory bound to get_sync_engine()"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_sync_engine())
+
+
+def SessionLocal() -> Session:
+    """New sync session"""
+    return get_sync_sessionmaker()()
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
     """
     Dependency function to get database session
     Use in FastAPI endpoints like:
     
     @app.get("/users")
-    def get_users(db: Session = Depends(get_db)):
+    async def get_users(db: AsyncSession = Depends(get_db)):
         ...
     """
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def get_sync_db() -> Iterator[Session]:
+    """Sync session for scripts/CLIs; requires DB_SYNC_ENGINE=true"""
     db = SessionLocal()
     try:
         yield db